@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for, flash
+from flask import Flask, Response, render_template, request, jsonify, send_file, session, redirect, url_for, flash
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 # Adicione estas importações no início do arquivo
 from reportlab.pdfgen import canvas
@@ -12,22 +12,54 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from roehn_converter import RoehnProjectConverter
 from datetime import datetime
-from sqlalchemy import event
-from sqlalchemy.engine import Engine
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import dump_options_header
 import uuid
 import io
 import csv
 import io
-import json
 import re
 import os
+import unicodedata
+from urllib.parse import quote
 from datetime import datetime
-from database import db, User, Projeto, Area, Ambiente, Circuito, Modulo, Vinculacao
+from database import db, User, Projeto, Area, Ambiente, Circuito, Modulo, Vinculacao, load_project_snapshot, upgrade_schema, insert_project_tree, import_project_data, IMPORT_SECTIONS, QUANTIDADE_SAKS, reservar_saks, liberar_saks
+from database import database_url_from_env, engine_options_from_env, sqlite_pragmas_from_env, listen_sqlite_pragmas, check_sqlite_pragmas
+from artifact_cache import ArtifactCache
+from flask.json.provider import DefaultJSONProvider
+import json_backend
+
+
+class BackendJSONProvider(DefaultJSONProvider):
+    """jsonify e request.get_json via json_backend, com a mesma saída do provider padrão"""
+
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault("default", self.default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        return json_backend.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return json_backend.loads(s)
+
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///projetos.db'
+app.json = BackendJSONProvider(app)
+# Banco e pool de conexões: DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url_from_env()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_from_env(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or 'sua-chave-secreta-muito-longa-aqui-altere-para-uma-chave-segura'
+# Cache em disco dos arquivos exportados (.rwp, PDF, CSV); 0 desativa
+app.config['ARTIFACT_CACHE_DIR'] = os.environ.get('ARTIFACT_CACHE_DIR') or os.path.join(app.instance_path, 'artifact_cache')
+app.config['ARTIFACT_CACHE_MAX_BYTES'] = int(os.environ.get('ARTIFACT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# Tamanho máximo de uma requisição (uploads de projeto); 0 desativa o limite.
+# Uploads acima de 500 KB já são gravados pelo Werkzeug em arquivo temporário
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 64 * 1024 * 1024)) or None
+# Pragmas aplicados em cada conexão SQLite (WAL, busy_timeout, cache...); ver database.SQLITE_PRAGMAS
+app.config['SQLITE_PRAGMAS'] = sqlite_pragmas_from_env()
 
 # Configuração do Flask-Login
 login_manager = LoginManager()
@@ -38,6 +70,8 @@ login_manager.login_message_category = 'info'
 
 db.init_app(app)
 
+artifact_cache = ArtifactCache(app.config['ARTIFACT_CACHE_DIR'], app.config['ARTIFACT_CACHE_MAX_BYTES'])
+
 # Informações sobre os módulos
 MODULO_INFO = {
     'RL12': {'nome_completo': 'ADP-RL12', 'canais': 12, 'tipos_permitidos': ['luz']},
@@ -47,14 +81,20 @@ MODULO_INFO = {
     'DIM8': {'nome_completo': 'ADP-DIM8', 'canais': 8, 'tipos_permitidos': ['luz']}
 }
 
-@event.listens_for(Engine, "connect")
-def set_sqlite_pragma(dbapi_connection, connection_record):
-    try:
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON")
-        cursor.close()
-    except Exception:
-        pass
+def report_sqlite_pragmas():
+    """Registra os pragmas efetivos do SQLite e avisa quando algum não foi aplicado
+
+    journal_mode=WAL, por exemplo, não é aceito em alguns sistemas de arquivos de rede.
+    O resumo sai como WARNING: o Flask e o gunicorn não exibem INFO por padrão.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    pragmas = app.config['SQLITE_PRAGMAS']
+    with db.engine.connect() as conn:
+        efetivos, divergentes = check_sqlite_pragmas(conn, pragmas)
+    app.logger.warning("SQLite: %s", ", ".join(f"{nome}={valor}" for nome, valor in efetivos.items()))
+    for nome in divergentes:
+        app.logger.warning("SQLite: PRAGMA %s=%s pedido, mas o valor efetivo é %s", nome, pragmas[nome], efetivos[nome])
 
 # Carregador de usuário para o Flask-Login
 @login_manager.user_loader
@@ -63,13 +103,47 @@ def load_user(user_id):
 
 # Criar tabelas e usuário admin padrão
 with app.app_context():
+    listen_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
     db.create_all()
+    upgrade_schema()
+    report_sqlite_pragmas()
     # Criar usuário admin padrão se não existir
     if not User.query.filter_by(username='admin').first():
         admin_user = User(username='admin', email='admin@empresa.com', role='admin')
         admin_user.set_password('admin123')  # Senha padrão - deve ser alterada após o primeiro login
         db.session.add(admin_user)
         db.session.commit()
+    # Fecha as conexões abertas aqui: com gunicorn --preload os workers são criados
+    # por fork e não podem herdar conexões do processo principal
+    db.engine.dispose()
+
+def content_disposition_attachment(download_name):
+    """Monta o cabeçalho Content-Disposition de download, como o send_file faz"""
+    try:
+        download_name.encode('ascii')
+        names = {'filename': download_name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        quoted = quote(download_name, safe="!#$&+^`|~")
+        names = {'filename': simple, 'filename*': f"UTF-8''{quoted}"}
+    return dump_options_header('attachment', names)
+
+def load_rwp_state(projeto_id, options):
+    """Carrega a árvore e o índice do último .rwp gerado com estas opções, se houver"""
+    cached = artifact_cache.get(projeto_id, 'estado', 'rwp-state', options)
+    if cached is None:
+        return None
+    try:
+        with cached as f:
+            return json_backend.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_rwp_state(projeto_id, options, converter):
+    """Guarda a árvore gerada para a próxima geração incremental"""
+    if not artifact_cache.enabled:
+        return
+    artifact_cache.put(projeto_id, 'estado', 'rwp-state', options, converter.export_state()).close()
 
 @app.route('/roehn/import', methods=['POST'])
 @login_required
@@ -105,32 +179,73 @@ def roehn_import():
         'programmer_email': request.form.get('programmer_email', current_user.email),
         'programmer_guid': str(uuid.uuid4()),
     }
+    output_mode = request.form.get('output_mode', 'pretty')
+    if request.form.get('deterministic'):
+        # GUIDs e datas derivados do projeto: o mesmo banco gera o mesmo .rwp
+        project_info['guid_seed'] = f"projeto:{projeto.id}"
+        project_info['programmer_guid'] = None
+        # Data da última alteração, que só muda junto com a revisão (chave do cache)
+        if projeto.atualizado_em is not None:
+            project_info['timestamp'] = projeto.atualizado_em.isoformat(timespec='seconds')
+    
+    # O programmer_guid aleatório não faz parte da chave do cache
+    state_options = {k: v for k, v in project_info.items() if k != 'programmer_guid'}
+    cache_options = dict(state_options, output_mode=output_mode)
+    rebuild = bool(request.form.get('rebuild'))
     
     try:
-        # Converter dados do projeto para Roehn
-        converter = RoehnProjectConverter()
-        converter.create_project(project_info)
-        
-        # Processar os dados do projeto atual - CORREÇÃO AQUI
-        # Garantir que estamos passando o projeto completo
-        converter.process_db_project(projeto)
+        nome_arquivo = f"{project_info['project_name']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.rwp"
         
-        # Gerar arquivo para download
-        project_json = converter.export_project()
+        # Ler a revisão antes dos dados, para nunca gravar conteúdo antigo sob uma revisão nova
+        revisao = projeto.revisao
+        cached = None if rebuild else artifact_cache.get(projeto.id, revisao, 'rwp', cache_options)
+        if cached is None:
+            # Snapshot carregado em poucas consultas, em vez de percorrer os relacionamentos lazy
+            snapshot = load_project_snapshot(projeto.id)
+            converter = RoehnProjectConverter()
+            # No modo reproduzível o arquivo depende só do banco, então não parte do anterior
+            incremental = not rebuild and 'guid_seed' not in project_info
+            state = load_rwp_state(projeto.id, state_options) if incremental else None
+            if state is not None:
+                # Atualizar o .rwp anterior só nos itens alterados, mantendo GUIDs e Unit IDs
+                try:
+                    converter.load_state(state)
+                    converter.update_db_project(snapshot)
+                except Exception as e:
+                    # Estado corrompido ou de uma versão antiga: gerar do zero
+                    app.logger.warning(f"Estado do .rwp do projeto {projeto.id} inválido, gerando do zero: {e!r}")
+                    converter = RoehnProjectConverter()
+                    state = None
+            if state is None:
+                # Converter dados do projeto para Roehn
+                converter.create_project(project_info)
+                converter.process_db_project(snapshot)
+            if 'guid_seed' not in project_info:
+                save_rwp_state(projeto.id, state_options, converter)
+            
+            # Gerar arquivo para download em blocos, direto da árvore do projeto
+            chunks = converter.export_project_stream(output_mode)
+            cached = artifact_cache.put(projeto.id, revisao, 'rwp', cache_options, chunks)
         
-        # Criar resposta para download
-        output = io.BytesIO()
-        output.write(project_json.encode('utf-8'))
-        output.seek(0)
+        if cached is not None:
+            response = send_file(
+                cached,
+                as_attachment=True,
+                download_name=nome_arquivo,
+                mimetype='application/json'
+            )
+        else:
+            response = Response(
+                chunks,
+                mimetype='application/json',
+                headers={'Content-Disposition': content_disposition_attachment(nome_arquivo)}
+            )
         
-        nome_arquivo = f"{project_info['project_name']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.rwp"
+        if output_mode == 'gzip':
+            # O navegador descomprime o download e salva o .rwp em JSON compacto
+            response.headers['Content-Encoding'] = 'gzip'
         
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=nome_arquivo,
-            mimetype='application/json'
-        )
+        return response
         
     except Exception as e:
         # Capturar informações detalhadas do erro
@@ -300,6 +415,7 @@ def excluir_projeto(projeto_id):
     
     db.session.delete(projeto)
     db.session.commit()
+    artifact_cache.invalidate(projeto_id)
     
     if session.get('projeto_atual_id') == projeto_id:
         session.pop('projeto_atual_id', None)
@@ -352,7 +468,7 @@ def ambientes():
     
     if request.method == 'POST':
         nome = request.form.get('nome')
-        area_id = request.form.get('area_id')
+        area_id = request.form.get('area_id', type=int)
         
         # Verificar se a área pertence ao projeto atual
         area = Area.query.get(area_id)
@@ -400,7 +516,7 @@ def circuitos():
         identificador = request.form.get('identificador')
         nome = request.form.get('nome')
         tipo = request.form.get('tipo')
-        ambiente_id = request.form.get('ambiente_id')
+        ambiente_id = request.form.get('ambiente_id', type=int)
         
         # Verificar se o ambiente pertence ao projeto atual
         ambiente = Ambiente.query.get(ambiente_id)
@@ -412,38 +528,9 @@ def circuitos():
         if circuito_existente:
             return jsonify({'success': False, 'message': 'Já existe um circuito com esse identificador neste ambiente'})
         
-        # Para circuitos HVAC, não gerar SAK
-        if tipo == 'hvac':
-            sak = None
-            quantidade_saks = 0
-        else:
-            # Determinar quantidade de SAKs baseada no tipo
-            if tipo == 'persiana':
-                quantidade_saks = 2
-            else:
-                quantidade_saks = 1
-            
-            # Encontrar o último SAK usado
-            ultimo_circuito = Circuito.query.join(Ambiente).join(Area).filter(
-                Area.projeto_id == projeto_atual_id,
-                Circuito.tipo != 'hvac'
-            ).order_by(Circuito.sak.desc()).first()
-            
-            # Calcular o próximo SAK disponível
-            if ultimo_circuito:
-                # Para persianas, precisamos de 2 SAKs consecutivos
-                if tipo == 'persiana':
-                    # Verificar se o próximo SAK está livre
-                    sak_disponivel = ultimo_circuito.sak + ultimo_circuito.quantidade_saks
-                    # Garantir que temos 2 SAKs consecutivos livres
-                    circuito_com_sak_seguinte = Circuito.query.filter_by(sak=sak_disponivel + 1).first()
-                    if circuito_com_sak_seguinte:
-                        sak_disponivel += 2  # Pular para o próximo par livre
-                    sak = sak_disponivel
-                else:
-                    sak = ultimo_circuito.sak + ultimo_circuito.quantidade_saks
-            else:
-                sak = 1
+        # HVAC não recebe SAK; persianas ocupam dois SAKs consecutivos
+        quantidade_saks = QUANTIDADE_SAKS.get(tipo, 1)
+        sak = reservar_saks(projeto_atual_id, quantidade_saks) if quantidade_saks else None
         
         novo_circuito = Circuito(
             identificador=identificador,
@@ -459,7 +546,7 @@ def circuitos():
     
     # Buscar apenas ambientes do projeto atual
     ambientes = Ambiente.query.join(Area).filter(Area.projeto_id == projeto_atual_id).all()
-    circuitos = Circuito.query.join(Ambiente).join(Area).filter(Area.projeto_id == projeto_atual_id).all()
+    circuitos = Circuito.query.filter_by(projeto_id=projeto_atual_id).order_by(Circuito.id).all()
     return render_template('circuitos.html', ambientes=ambientes, circuitos=circuitos)
 
 @app.route('/circuitos/<int:id>', methods=['DELETE'])
@@ -468,13 +555,15 @@ def excluir_circuito(id):
     circuito = Circuito.query.get_or_404(id)
     
     # Verificar se o circuito pertence ao projeto atual
-    if circuito.ambiente.area.projeto_id != session.get('projeto_atual_id'):
+    if circuito.projeto_id != session.get('projeto_atual_id'):
         return jsonify({'success': False, 'message': 'Circuito não pertence ao projeto atual'})
     
     # Verificar se o circuito tem vinculação
     if circuito.vinculacao:
         return jsonify({'success': False, 'message': 'Não é possível excluir circuito com vinculação ativa'})
     
+    if circuito.sak is not None:
+        liberar_saks(circuito.projeto_id, circuito.sak, circuito.quantidade_saks, circuito.tipo)
     db.session.delete(circuito)
     db.session.commit()
     return jsonify({'success': True})
@@ -533,13 +622,14 @@ def vinculacao():
     projeto_atual_id = session.get('projeto_atual_id')
     
     if request.method == 'POST':
-        circuito_id = request.form.get('circuito_id')
-        modulo_id = request.form.get('modulo_id')
-        canal = request.form.get('canal')
+        # Convertidos para int: bancos como o PostgreSQL não comparam texto com colunas inteiras
+        circuito_id = request.form.get('circuito_id', type=int)
+        modulo_id = request.form.get('modulo_id', type=int)
+        canal = request.form.get('canal', type=int)
         
         # Verificar se o circuito pertence ao projeto atual
         circuito = Circuito.query.get(circuito_id)
-        if not circuito or circuito.ambiente.area.projeto_id != projeto_atual_id:
+        if not circuito or circuito.projeto_id != projeto_atual_id:
             return jsonify({'success': False, 'message': 'Circuito inválido'})
         
         # Obter informações do módulo
@@ -547,6 +637,9 @@ def vinculacao():
         if not modulo or modulo.projeto_id != projeto_atual_id:
             return jsonify({'success': False, 'message': 'Módulo inválido'})
         
+        if canal is None:
+            return jsonify({'success': False, 'message': 'Canal inválido'})
+        
         # Validar compatibilidade de tipos
         tipos_permitidos = MODULO_INFO[modulo.tipo]['tipos_permitidos']
         if circuito.tipo not in tipos_permitidos:
@@ -584,7 +677,7 @@ def vinculacao():
         .select_from(Circuito)
         .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
         .join(Area, Ambiente.area_id == Area.id)
-        .filter(Area.projeto_id == projeto_atual_id)
+        .filter(Circuito.projeto_id == projeto_atual_id)
         .filter(~Circuito.vinculacao.has())  # evita JOIN extra e ambiguidade
         .order_by(Area.nome, Ambiente.nome, Circuito.identificador)
         .all()
@@ -607,7 +700,7 @@ def vinculacao():
         .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
         .join(Area, Ambiente.area_id == Area.id)
         .join(Modulo, Vinculacao.modulo_id == Modulo.id)
-        .filter(Area.projeto_id == projeto_atual_id)
+        .filter(Vinculacao.projeto_id == projeto_atual_id)
         .order_by(Area.nome, Ambiente.nome, Circuito.identificador, Modulo.nome, Vinculacao.canal)
         .all()
     )
@@ -639,7 +732,7 @@ def excluir_vinculacao(id):
     vinculacao = Vinculacao.query.get_or_404(id)
     
     # Verificar se a vinculação pertence ao projeto atual
-    if vinculacao.circuito.ambiente.area.projeto_id != session.get('projeto_atual_id'):
+    if vinculacao.projeto_id != session.get('projeto_atual_id'):
         return jsonify({'success': False, 'message': 'Vinculação não pertence ao projeto atual'})
     
     db.session.delete(vinculacao)
@@ -659,7 +752,23 @@ def exportar_csv():
     projeto_atual_id = session.get('projeto_atual_id')
     projeto = Projeto.query.get(projeto_atual_id)
     
-    circuitos = Circuito.query.join(Ambiente).join(Area).filter(Area.projeto_id == projeto_atual_id).all()
+    # Obter nome do projeto para usar no nome do arquivo
+    nome_projeto = projeto.nome if projeto else 'projeto'
+    
+    # Limpar o nome do projeto para usar no nome do arquivo
+    nome_arquivo = re.sub(r'[^a-zA-Z0-9_]', '_', nome_projeto)
+    
+    revisao = projeto.revisao if projeto else None
+    cached = artifact_cache.get(projeto.id, revisao, 'csv') if projeto else None
+    if cached is not None:
+        return send_file(
+            cached,
+            mimetype='text/csv',
+            as_attachment=True,
+            download_name=f'{nome_arquivo}_roehn.csv'
+        )
+    
+    circuitos = Circuito.query.filter_by(projeto_id=projeto_atual_id).order_by(Circuito.id).all()
     
     output = io.StringIO()
     writer = csv.writer(output)
@@ -693,16 +802,11 @@ def exportar_csv():
                 modulo.id
             ])
     
-    output.seek(0)
-    
-    # Obter nome do projeto para usar no nome do arquivo
-    nome_projeto = projeto.nome if projeto else 'projeto'
-    
-    # Limpar o nome do projeto para usar no nome do arquivo
-    nome_arquivo = re.sub(r'[^a-zA-Z0-9_]', '_', nome_projeto)
+    csv_bytes = output.getvalue().encode('utf-8')
+    cached = artifact_cache.put(projeto.id, revisao, 'csv', None, csv_bytes) if projeto else None
     
     return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
+        cached or io.BytesIO(csv_bytes),
         mimetype='text/csv',
         as_attachment=True,
         download_name=f'{nome_arquivo}_roehn.csv'
@@ -755,7 +859,8 @@ def exportar_projeto(projeto_id):
                     'nome': circuito.nome,
                     'tipo': circuito.tipo,
                     'ambiente_id': circuito.ambiente_id,
-                    'sak': circuito.sak
+                    'sak': circuito.sak,
+                    'quantidade_saks': circuito.quantidade_saks
                 }
                 projeto_data['circuitos'].append(circuito_data)
     
@@ -769,21 +874,18 @@ def exportar_projeto(projeto_id):
         }
         projeto_data['modulos'].append(modulo_data)
     
-    for vinculacao in Vinculacao.query.all():
-        # Verificar se o circuito pertence ao projeto
-        circuito = Circuito.query.get(vinculacao.circuito_id)
-        if circuito and circuito.ambiente.area.projeto_id == projeto_id:
-            vinculacao_data = {
-                'id': vinculacao.id,
-                'circuito_id': vinculacao.circuito_id,
-                'modulo_id': vinculacao.modulo_id,
-                'canal': vinculacao.canal
-            }
-            projeto_data['vinculacoes'].append(vinculacao_data)
+    for vinculacao in Vinculacao.query.filter_by(projeto_id=projeto_id).order_by(Vinculacao.id).all():
+        vinculacao_data = {
+            'id': vinculacao.id,
+            'circuito_id': vinculacao.circuito_id,
+            'modulo_id': vinculacao.modulo_id,
+            'canal': vinculacao.canal
+        }
+        projeto_data['vinculacoes'].append(vinculacao_data)
     
     # Converter para JSON
     output = io.BytesIO()
-    output.write(json.dumps(projeto_data, indent=2).encode('utf-8'))
+    output.write(json_backend.dumpb(projeto_data, indent=2))
     output.seek(0)
     
     # Nome do arquivo
@@ -796,6 +898,11 @@ def exportar_projeto(projeto_id):
         download_name=nome_arquivo
     )
 
+@app.errorhandler(RequestEntityTooLarge)
+def arquivo_muito_grande(e):
+    limite = app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024)
+    return jsonify({'success': False, 'message': f'Arquivo maior que o limite de {limite:g} MB'}), 413
+
 @app.route('/importar-projeto', methods=['POST'])
 @login_required
 def importar_projeto():
@@ -808,73 +915,11 @@ def importar_projeto():
     
     if file and file.filename.endswith('.json'):
         try:
-            data = json.load(file)
+            # Lido em blocos: as listas são inseridas em lotes sem carregar o arquivo inteiro
+            secoes = json_backend.iter_object(file.stream, arrays=tuple(IMPORT_SECTIONS))
             
             # Criar novo projeto - usar o nome original
-            projeto_nome = data['projeto']['nome']
-            novo_projeto = Projeto(nome=projeto_nome, user_id=current_user.id)
-            db.session.add(novo_projeto)
-            db.session.flush()  # Para obter o ID
-            
-            # Mapeamento de IDs antigos para novos
-            area_id_map = {}
-            ambiente_id_map = {}
-            circuito_id_map = {}
-            modulo_id_map = {}
-            
-            # Importar áreas
-            for area_data in data['areas']:
-                nova_area = Area(
-                    nome=area_data['nome'],
-                    projeto_id=novo_projeto.id
-                )
-                db.session.add(nova_area)
-                db.session.flush()
-                area_id_map[area_data['id']] = nova_area.id
-            
-            # Importar ambientes
-            for ambiente_data in data['ambientes']:
-                novo_ambiente = Ambiente(
-                    nome=ambiente_data['nome'],
-                    area_id=area_id_map[ambiente_data['area_id']]
-                )
-                db.session.add(novo_ambiente)
-                db.session.flush()
-                ambiente_id_map[ambiente_data['id']] = novo_ambiente.id
-            
-            # Importar circuitos
-            for circuito_data in data['circuitos']:
-                novo_circuito = Circuito(
-                    identificador=circuito_data['identificador'],
-                    nome=circuito_data['nome'],
-                    tipo=circuito_data['tipo'],
-                    ambiente_id=ambiente_id_map[circuito_data['ambiente_id']],
-                    sak=circuito_data['sak']
-                )
-                db.session.add(novo_circuito)
-                db.session.flush()
-                circuito_id_map[circuito_data['id']] = novo_circuito.id
-            
-            # Importar módulos
-            for modulo_data in data['modulos']:
-                novo_modulo = Modulo(
-                    nome=modulo_data['nome'],
-                    tipo=modulo_data['tipo'],
-                    quantidade_canais=modulo_data['quantidade_canais'],
-                    projeto_id=novo_projeto.id
-                )
-                db.session.add(novo_modulo)
-                db.session.flush()
-                modulo_id_map[modulo_data['id']] = novo_modulo.id
-            
-            # Importar vinculações
-            for vinculacao_data in data['vinculacoes']:
-                nova_vinculacao = Vinculacao(
-                    circuito_id=circuito_id_map[vinculacao_data['circuito_id']],
-                    modulo_id=modulo_id_map[vinculacao_data['modulo_id']],
-                    canal=vinculacao_data['canal']
-                )
-                db.session.add(nova_vinculacao)
+            novo_projeto = import_project_data(current_user.id, secoes)
             
             db.session.commit()
             
@@ -886,6 +931,38 @@ def importar_projeto():
     
     return jsonify({'success': False, 'message': 'Formato de arquivo inválido'})
 
+@app.route('/importar-rwp', methods=['POST'])
+@login_required
+def importar_rwp():
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'message': 'Nenhum arquivo enviado'})
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'success': False, 'message': 'Nenhum arquivo selecionado'})
+    
+    if not file.filename.lower().endswith(('.rwp', '.rwp.gz')):
+        return jsonify({'success': False, 'message': 'Formato de arquivo inválido'})
+    
+    try:
+        dados = RoehnProjectConverter().parse_rwp(file.stream)
+        
+        # O nome informado no formulário tem prioridade sobre o nome gravado no .rwp
+        projeto_nome = (request.form.get('nome') or dados['nome'] or '').strip()
+        if not projeto_nome:
+            return jsonify({'success': False, 'message': 'Nome do projeto é obrigatório'})
+        if Projeto.query.filter_by(nome=projeto_nome).first():
+            return jsonify({'success': False, 'message': 'Já existe um projeto com esse nome'})
+        
+        novo_projeto = insert_project_tree(projeto_nome, current_user.id, dados['areas'], dados['modulos'])
+        db.session.commit()
+        
+        return jsonify({'success': True, 'projeto_id': novo_projeto.id})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro na importação: {str(e)}'})
+
 @app.route('/user/change-password', methods=['POST'])
 @login_required
 def change_password():
@@ -910,6 +987,24 @@ def exportar_pdf(projeto_id):
         flash('Acesso negado a este projeto', 'danger')
         return redirect(url_for('index'))
     
+    # Nome do arquivo
+    nome_arquivo = f"projeto_{projeto.nome}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    
+    # O relatório traz o nome de quem emitiu, então ele faz parte da chave do cache.
+    # As datas impressas vêm da última alteração do projeto, que muda junto com a
+    # revisão: um PDF em cache nunca mostra uma data diferente da que teria se gerado agora
+    revisao = projeto.revisao
+    data_revisao = projeto.atualizado_em or datetime.now()
+    cache_options = {'emitido_por': current_user.username}
+    cached = artifact_cache.get(projeto.id, revisao, 'pdf', cache_options)
+    if cached is not None:
+        return send_file(
+            cached,
+            as_attachment=True,
+            download_name=nome_arquivo,
+            mimetype='application/pdf'
+        )
+    
     # Criar buffer para o PDF
     buffer = io.BytesIO()
     
@@ -978,7 +1073,7 @@ def exportar_pdf(projeto_id):
     # E use este novo estilo:
     elements.append(Paragraph(f"<b>Projeto:</b> {projeto.nome}", styles['LeftNormal']))
     elements.append(Spacer(1, 0.1*inch))
-    elements.append(Paragraph(f"<b>Data de emissão:</b> {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['LeftNormal']))
+    elements.append(Paragraph(f"<b>Última alteração:</b> {data_revisao.strftime('%d/%m/%Y %H:%M')}", styles['LeftNormal']))
     elements.append(Spacer(1, 0.1*inch))
     elements.append(Paragraph(f"<b>Emitido por:</b> {current_user.username}", styles['LeftNormal']))
     elements.append(Spacer(1, 0.3*inch))
@@ -1195,19 +1290,17 @@ def exportar_pdf(projeto_id):
     elements.append(Spacer(1, 0.5*inch))
     elements.append(Paragraph("Zafiro - Luxury Technology", 
                              styles['RoehnCenter']))
-    elements.append(Paragraph(f"Relatório gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}", 
+    elements.append(Paragraph(f"Relatório da revisão {revisao}, de {data_revisao.strftime('%d/%m/%Y às %H:%M')}", 
                              styles['RoehnCenter']))
     
     # Construir o PDF
     doc.build(elements)
     
+    cached = artifact_cache.put(projeto.id, revisao, 'pdf', cache_options, buffer.getvalue())
     buffer.seek(0)
     
-    # Nome do arquivo
-    nome_arquivo = f"projeto_{projeto.nome}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    
     return send_file(
-        buffer,
+        cached or buffer,
         as_attachment=True,
         download_name=nome_arquivo,
         mimetype='application/pdf'
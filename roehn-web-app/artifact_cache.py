@@ -0,0 +1,120 @@
+# artifact_cache.py
+"""Cache em disco dos arquivos gerados (.rwp, PDF, CSV) por revisão de projeto.
+
+Cada artefato é identificado por (projeto, revisão, tipo, opções). Como a
+revisão do projeto muda a cada escrita nos seus dados, um projeto inalterado é
+servido direto do disco. Os arquivos são gravados de forma atômica (arquivo
+temporário + os.replace), então vários processos do servidor podem compartilhar
+o mesmo diretório. O tamanho total é limitado com despejo LRU pela data de
+modificação, que é atualizada a cada acerto. Como outro processo pode
+despejar um artefato a qualquer momento, get() e put() devolvem o arquivo já
+aberto: o descritor continua válido mesmo depois da remoção.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+
+class ArtifactCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def path_for(self, projeto_id, revisao, kind, options=None):
+        """Caminho do artefato para a chave (projeto, revisão, tipo, opções)"""
+        key = json.dumps([projeto_id, revisao, kind, options or {}], sort_keys=True, default=str)
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.directory, f"{projeto_id}-{revisao}-{kind}-{digest}.bin")
+
+    def get(self, projeto_id, revisao, kind, options=None):
+        """Abre o artefato em cache para leitura binária, ou retorna None se não existir"""
+        if not self.enabled:
+            return None
+        path = self.path_for(projeto_id, revisao, kind, options)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            # Marca o acesso para o despejo LRU
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return f
+
+    def put(self, projeto_id, revisao, kind, options, chunks):
+        """Grava o artefato a partir de blocos de bytes e o retorna aberto para leitura binária
+
+        Retorna None quando o cache está desativado.
+        """
+        if not self.enabled:
+            return None
+        if isinstance(chunks, bytes):
+            chunks = (chunks,)
+        path = self.path_for(projeto_id, revisao, kind, options)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        # Aberto antes do despejo; é o artefato mais recente, o último a sair
+        f = open(path, 'rb')
+        self._evict(keep=path)
+        return f
+
+    def invalidate(self, projeto_id):
+        """Remove todos os artefatos de um projeto (ex.: ao excluí-lo, já que o ID pode ser reutilizado)"""
+        if not self.enabled:
+            return
+        prefix = f"{projeto_id}-"
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.startswith(prefix) and entry.name.endswith('.bin'):
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+
+    def _evict(self, keep=None):
+        """Remove os artefatos menos usados até o total caber em max_bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.bin'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Outro processo já removeu
+                pass
+            total -= size
@@ -0,0 +1,198 @@
+# batch_convert.py
+"""Gera arquivos .rwp em lote direto do banco, sem passar pelo servidor web.
+
+Exemplos:
+    python batch_convert.py --all --output-dir saida
+    python batch_convert.py 3 7 12 --manifest clientes.csv --workers 4
+
+O manifesto (JSON ou CSV) fornece o project_info de cada projeto. Em CSV, a
+coluna 'projeto_id' identifica o projeto e as demais colunas são as chaves de
+project_info (client_name, m4_ip, timezone_id, ...). Em JSON, use uma lista de
+objetos com 'projeto_id' ou um objeto {"<projeto_id>": {...}}; a chave
+"default" vale para todos os projetos.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from flask import Flask
+
+from database import (
+    db, Projeto, load_project_snapshot, database_url_from_env, engine_options_from_env, sqlite_pragmas_from_env,
+    listen_sqlite_pragmas,
+)
+from roehn_converter import RoehnProjectConverter, EXPORT_MODES
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'projetos.db')
+
+# App Flask mínima de cada processo, criada em _init_worker
+_worker_app = None
+
+
+def _is_url(db_path):
+    return '://' in db_path
+
+
+def create_db_app(db_path):
+    """Cria uma app Flask só com o banco configurado, para uso fora do servidor
+
+    'db_path' é o caminho de um arquivo SQLite ou uma URL do SQLAlchemy.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = db_path if _is_url(db_path) else f"sqlite:///{os.path.abspath(db_path)}"
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_from_env(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    # Mesmo perfil do servidor (WAL, busy_timeout, foreign_keys...): os workers leem em paralelo
+    with app.app_context():
+        listen_sqlite_pragmas(db.engine, sqlite_pragmas_from_env())
+    return app
+
+
+def load_manifest(path):
+    """Lê o manifesto e retorna (project_info padrão, {projeto_id: project_info})"""
+    if not path:
+        return {}, {}
+
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            entries = list(csv.DictReader(f))
+    else:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            entries = [dict(info, projeto_id=key) for key, info in data.items()]
+        else:
+            entries = data
+
+    default_info = {}
+    per_project = {}
+    for entry in entries:
+        info = {k: v for k, v in entry.items() if k != 'projeto_id' and v not in (None, '')}
+        projeto_id = str(entry.get('projeto_id', '')).strip()
+        if projeto_id == 'default':
+            default_info = info
+        elif projeto_id:
+            per_project[int(projeto_id)] = info
+    return default_info, per_project
+
+
+def _init_worker(db_path, log_level):
+    global _worker_app
+    logging.basicConfig(level=log_level, format="%(processName)s %(levelname)s %(name)s: %(message)s")
+    _worker_app = create_db_app(db_path)
+
+
+def _safe_filename(nome):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', nome)
+
+
+def convert_project(projeto_id, project_info, output_dir, output_mode, deterministic=False):
+    """Converte um projeto e grava o .rwp; executado dentro do processo do pool"""
+    started = time.perf_counter()
+    with _worker_app.app_context():
+        snapshot = load_project_snapshot(projeto_id)
+        db.session.remove()
+    if snapshot is None:
+        raise ValueError(f"Projeto {projeto_id} não encontrado")
+
+    info = dict(project_info)
+    info.setdefault('project_name', snapshot.nome)
+    if deterministic:
+        info.setdefault('guid_seed', f"projeto:{projeto_id}")
+        if snapshot.atualizado_em is not None:
+            info.setdefault('timestamp', snapshot.atualizado_em.isoformat(timespec='seconds'))
+
+    converter = RoehnProjectConverter()
+    converter.create_project(info)
+    converter.process_db_project(snapshot)
+
+    extension = '.rwp.gz' if output_mode == 'gzip' else '.rwp'
+    path = os.path.join(output_dir, f"{projeto_id}_{_safe_filename(info['project_name'])}{extension}")
+    size = 0
+    with open(path, 'wb') as f:
+        for chunk in converter.export_project_stream(output_mode):
+            f.write(chunk)
+            size += len(chunk)
+
+    circuitos = sum(len(amb.circuitos) for area in snapshot.areas for amb in area.ambientes)
+    return path, circuitos, size, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera arquivos .rwp em lote a partir do banco de projetos")
+    parser.add_argument('projeto_ids', nargs='*', type=int, help="IDs dos projetos a converter")
+    parser.add_argument('--all', action='store_true', help="converter todos os projetos do banco")
+    parser.add_argument('--db', default=database_url_from_env(default=DEFAULT_DB_PATH),
+                        help="caminho do projetos.db ou URL do banco (padrão: DATABASE_URL)")
+    parser.add_argument('--output-dir', default='rwp', help="diretório de saída dos arquivos .rwp")
+    parser.add_argument('--manifest', help="manifesto JSON ou CSV com o project_info de cada projeto")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="número de processos")
+    parser.add_argument('--output-mode', choices=EXPORT_MODES, default='pretty', help="formato do .rwp")
+    parser.add_argument('--deterministic', action='store_true',
+                        help="GUIDs derivados do projeto, para gerar arquivos reproduzíveis")
+    parser.add_argument('--timestamp', help="data ISO gravada no projeto (padrão: agora, ou a da última alteração do projeto com --deterministic)")
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help="-v mostra o resumo de cada conversão, -vv o detalhe por circuito")
+    args = parser.parse_args(argv)
+    log_level = [logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)]
+
+    if not _is_url(args.db) and not os.path.exists(args.db):
+        parser.error(f"banco de dados não encontrado: {args.db}")
+
+    projeto_ids = list(args.projeto_ids)
+    if args.all:
+        with create_db_app(args.db).app_context():
+            projeto_ids = [row.id for row in db.session.query(Projeto.id).order_by(Projeto.id)]
+    if not projeto_ids:
+        parser.error("informe os IDs dos projetos ou use --all")
+
+    default_info, per_project = load_manifest(args.manifest)
+    if args.timestamp:
+        default_info.setdefault('timestamp', args.timestamp)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    workers = max(1, min(args.workers, len(projeto_ids)))
+    started = time.perf_counter()
+    total_circuitos = 0
+    total_bytes = 0
+    falhas = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(args.db, log_level)) as pool:
+        futures = {
+            pool.submit(
+                convert_project, projeto_id, {**default_info, **per_project.get(projeto_id, {})},
+                args.output_dir, args.output_mode, args.deterministic,
+            ): projeto_id
+            for projeto_id in projeto_ids
+        }
+        for future in as_completed(futures):
+            projeto_id = futures[future]
+            try:
+                path, circuitos, size, elapsed = future.result()
+            except Exception as e:
+                falhas += 1
+                print(f"[ERRO] projeto {projeto_id}: {e}", file=sys.stderr)
+                continue
+            total_circuitos += circuitos
+            total_bytes += size
+            print(f"[OK] projeto {projeto_id}: {path} ({circuitos} circuitos, {size / 1024:.1f} KiB, {elapsed:.2f}s)")
+
+    elapsed = time.perf_counter() - started
+    convertidos = len(projeto_ids) - falhas
+    print(
+        f"{convertidos}/{len(projeto_ids)} projetos em {elapsed:.2f}s "
+        f"({convertidos / elapsed:.2f} projetos/s, {total_circuitos / elapsed:.0f} circuitos/s, "
+        f"{total_bytes / (1024 * 1024):.2f} MiB gravados, {workers} processos)"
+    )
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,290 @@
+# benchmark_converter.py
+"""Mede o desempenho do RoehnProjectConverter com projetos sintéticos.
+
+Exemplos:
+    python benchmark_converter.py --preset grande --output bench.json
+    python benchmark_converter.py --areas 20 --rooms 10 --circuits 25 --mix luz=60,persiana=30,hvac=10
+    python benchmark_converter.py --preset medio --compare bench_anterior.json
+
+Cada fase (create_project, process_db_project, process_csv e export_project
+em cada modo de saída) é cronometrada separadamente; o tempo registrado é a
+mediana de --repeat execuções. O pico de memória de cada fase é medido com
+tracemalloc em uma execução à parte, para não distorcer os tempos.
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from database import (
+    ProjetoSnapshot, AreaSnapshot, AmbienteSnapshot, CircuitoSnapshot, VinculacaoSnapshot, ModuloSnapshot,
+)
+import json_backend
+from roehn_converter import RoehnProjectConverter, EXPORT_MODES, DB_MODULE_TYPES, LINK_SLOTS, MODULES_INFO
+
+# (áreas, ambientes por área, circuitos por ambiente)
+PRESETS = {
+    'pequeno': (2, 3, 5),
+    'medio': (5, 10, 20),
+    'grande': (10, 30, 30),
+}
+
+DEFAULT_MIX = {'luz': 70, 'persiana': 20, 'hvac': 10}
+
+# Mesmo project_info para todas as execuções (GUIDs aleatórios, como no servidor)
+PROJECT_INFO = {'project_name': 'Benchmark', 'client_name': 'Benchmark', 'm4_ip': '192.168.0.245'}
+
+
+def parse_mix(text):
+    """Converte 'luz=70,persiana=20,hvac=10' em {'luz': 70, ...}"""
+    mix = {}
+    for part in text.split(','):
+        tipo, _, peso = part.partition('=')
+        tipo = tipo.strip()
+        if tipo not in LINK_SLOTS:
+            raise argparse.ArgumentTypeError(f"tipo de circuito desconhecido: {tipo}")
+        mix[tipo] = float(peso)
+    return mix
+
+
+def _models_by_tipo(modules_info):
+    """Modelos de módulo que aceitam cada tipo de circuito, com a capacidade do slot usado"""
+    models = {}
+    for tipo, slot_names in LINK_SLOTS.items():
+        for model, info in modules_info.items():
+            capacity = next((info['slots'][name] for name in slot_names if name in info['slots']), None)
+            if capacity is not None:
+                models.setdefault(tipo, []).append((model, capacity))
+    return models
+
+
+def build_project(areas, rooms, circuits, mix, seed=0, modules_info=MODULES_INFO):
+    """Monta um snapshot sintético no formato de database.load_project_snapshot
+
+    Os tipos dos circuitos seguem os pesos de 'mix'; cada tipo ocupa os canais
+    de módulos dos modelos de modules_info que o aceitam, alternando entre
+    eles a cada módulo preenchido.
+    """
+    rng = random.Random(seed)
+    tipos = list(mix)
+    pesos = [mix[tipo] for tipo in tipos]
+    models = _models_by_tipo(modules_info)
+
+    modulos = []
+    # tipo -> [módulo atual, canais usados, índice do modelo]
+    current = {}
+
+    def next_channel(tipo):
+        state = current.get(tipo)
+        if state is None or state[1] >= state[0].quantidade_canais:
+            model_index = 0 if state is None else (state[2] + 1) % len(models[tipo])
+            model, capacity = models[tipo][model_index]
+            db_tipo = DB_MODULE_TYPES[model]
+            modulo = ModuloSnapshot(len(modulos) + 1, f"{db_tipo}-{len(modulos) + 1}", db_tipo, capacity)
+            modulos.append(modulo)
+            state = current[tipo] = [modulo, 0, model_index]
+        state[1] += 1
+        return state[0], state[1]
+
+    circuito_id = 0
+    area_list = []
+    for a in range(areas):
+        ambientes = []
+        for r in range(rooms):
+            circuitos = []
+            for _ in range(circuits):
+                circuito_id += 1
+                tipo = rng.choices(tipos, pesos)[0]
+                modulo, canal = next_channel(tipo)
+                circuitos.append(CircuitoSnapshot(
+                    circuito_id, f"C{circuito_id}", f"Circuito {circuito_id}", tipo,
+                    None if tipo == 'hvac' else circuito_id, 0 if tipo == 'hvac' else 1,
+                    VinculacaoSnapshot(circuito_id, modulo, canal),
+                ))
+            ambientes.append(AmbienteSnapshot(a * rooms + r + 1, f"Ambiente {r + 1}", tuple(circuitos)))
+        area_list.append(AreaSnapshot(a + 1, f"Área {a + 1}", tuple(ambientes)))
+
+    return ProjetoSnapshot(1, 'Benchmark', tuple(area_list), tuple(modulos))
+
+
+def project_to_csv(projeto):
+    """Gera o CSV de entrada de process_csv equivalente ao snapshot"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['Circuito', 'Tipo', 'Nome', 'Area', 'Ambiente', 'SAKs', 'Canal', 'Modulo', 'id Modulo'])
+    for area in projeto.areas:
+        for ambiente in area.ambientes:
+            for circuito in ambiente.circuitos:
+                vinculacao = circuito.vinculacao
+                writer.writerow([
+                    circuito.identificador, circuito.tipo, circuito.nome, area.nome, ambiente.nome,
+                    circuito.sak or '', vinculacao.canal, vinculacao.modulo.tipo, vinculacao.modulo.id,
+                ])
+    return buffer.getvalue()
+
+
+def _phases(projeto, csv_content):
+    """Fases medidas: nome -> (função, operações por execução)"""
+    circuitos = sum(len(ambiente.circuitos) for area in projeto.areas for ambiente in area.ambientes)
+
+    def create_project():
+        RoehnProjectConverter().create_project(PROJECT_INFO)
+
+    def process_db_project():
+        converter = RoehnProjectConverter()
+        converter.create_project(PROJECT_INFO)
+        converter.process_db_project(projeto)
+
+    def process_csv():
+        converter = RoehnProjectConverter()
+        converter.create_project(PROJECT_INFO)
+        converter.process_csv(csv_content)
+
+    converter = RoehnProjectConverter()
+    converter.create_project(PROJECT_INFO)
+    converter.process_db_project(projeto)
+
+    phases = {
+        'create_project': (create_project, 1),
+        'process_db_project': (process_db_project, circuitos),
+        'process_csv': (process_csv, circuitos),
+    }
+    for mode in EXPORT_MODES:
+        phases[f'export_project[{mode}]'] = (lambda mode=mode: converter.export_project(mode), circuitos)
+    return phases, converter
+
+
+def run_benchmark(projeto, repeat=5):
+    """Executa as fases e retorna {fase: métricas} e o tamanho da saída em cada modo"""
+    csv_content = project_to_csv(projeto)
+    phases, converter = _phases(projeto, csv_content)
+
+    results = {}
+    for name, (func, ops) in phases.items():
+        func()  # aquecimento
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        median = statistics.median(timings)
+        results[name] = {
+            'segundos': median,
+            'segundos_min': min(timings),
+            'operacoes': ops,
+            'ops_por_segundo': ops / median if median else None,
+            'pico_memoria_bytes': peak,
+        }
+
+    output_size = {}
+    for mode in EXPORT_MODES:
+        exported = converter.export_project(mode)
+        output_size[mode] = len(exported if isinstance(exported, bytes) else exported.encode('utf-8'))
+    return results, output_size
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    """Imprime a variação de tempo e memória de cada fase em relação a um resultado anterior"""
+    if previous.get('projeto') != current['projeto']:
+        print("Aviso: o resultado anterior usou outro projeto sintético; a comparação não é direta")
+    for name, metrics in current['resultados'].items():
+        old = previous.get('resultados', {}).get(name)
+        if not old:
+            print(f"{name:32s} (sem resultado anterior)")
+            continue
+        delta_time = (metrics['segundos'] / old['segundos'] - 1) * 100 if old['segundos'] else 0.0
+        delta_mem = (metrics['pico_memoria_bytes'] / old['pico_memoria_bytes'] - 1) * 100 \
+            if old['pico_memoria_bytes'] else 0.0
+        print(f"{name:32s} tempo {delta_time:+7.1f}%  memória {delta_mem:+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do RoehnProjectConverter com projetos sintéticos")
+    parser.add_argument('--preset', choices=PRESETS, default='medio', help="tamanho do projeto sintético")
+    parser.add_argument('--areas', type=int, help="número de áreas (substitui o preset)")
+    parser.add_argument('--rooms', type=int, help="ambientes por área (substitui o preset)")
+    parser.add_argument('--circuits', type=int, help="circuitos por ambiente (substitui o preset)")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help="pesos dos tipos de circuito, ex.: luz=70,persiana=20,hvac=10")
+    parser.add_argument('--seed', type=int, default=0, help="semente do gerador de tipos")
+    parser.add_argument('--repeat', type=int, default=5, help="execuções cronometradas por fase")
+    parser.add_argument('--output', help="grava os resultados em JSON neste arquivo")
+    parser.add_argument('--compare', help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args(argv)
+
+    # O resumo INFO do conversor não deve entrar na medição
+    logging.basicConfig(level=logging.WARNING)
+
+    areas, rooms, circuits = PRESETS[args.preset]
+    areas = args.areas or areas
+    rooms = args.rooms or rooms
+    circuits = args.circuits or circuits
+
+    projeto = build_project(areas, rooms, circuits, args.mix, args.seed)
+    results, output_size = run_benchmark(projeto, args.repeat)
+
+    report = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'revisao': _git_revision(),
+        'python': platform.python_version(),
+        'json_backend': json_backend.BACKEND,
+        'plataforma': platform.platform(),
+        'projeto': {
+            'areas': areas,
+            'ambientes_por_area': rooms,
+            'circuitos_por_ambiente': circuits,
+            'circuitos': areas * rooms * circuits,
+            'modulos': len(projeto.modulos),
+            'mix': args.mix,
+            'seed': args.seed,
+        },
+        'repeticoes': args.repeat,
+        'resultados': results,
+        'tamanho_saida_bytes': output_size,
+    }
+
+    print(f"Backend JSON: {json_backend.BACKEND}")
+    print(f"Projeto: {areas} áreas x {rooms} ambientes x {circuits} circuitos "
+          f"({areas * rooms * circuits} circuitos, {len(projeto.modulos)} módulos)")
+    for name, metrics in results.items():
+        ops = f"{metrics['ops_por_segundo']:12.1f} ops/s" if metrics['ops_por_segundo'] else ''
+        print(f"{name:32s} {metrics['segundos'] * 1000:10.2f} ms {ops}  "
+              f"pico {metrics['pico_memoria_bytes'] / (1024 * 1024):8.2f} MiB")
+    for mode, size in output_size.items():
+        print(f"saída {mode:8s} {size / 1024:10.1f} KiB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# json_backend.py
+"""Serialização JSON com backend rápido opcional.
+
+Usa o orjson quando ele está instalado e o módulo json da biblioteca padrão
+caso contrário. dumps/dumpb/loads aceitam os mesmos argumentos de json.dumps e
+json.loads e produzem a mesma saída. Quando o orjson não consegue reproduzir a
+saída (inteiros acima de 64 bits, chaves que não são strings, indentação
+diferente de 2, argumentos extras), ela é gerada pelo json padrão.
+
+Diferenças conhecidas, só com floats: valores com |x| < 1e-4 ou >= 1e16 saem
+em outra notação (0.00001 em vez de 1e-05, 1e16 em vez de 1e+16; mesmo
+valor), e NaN/Infinity, que o json padrão grava como literais que não são JSON
+válido, saem como null. Os dados dos projetos não usam essa faixa.
+
+iter_object lê um objeto JSON de um arquivo aos poucos, entregando as listas
+de nível mais alto item a item; usa só o json padrão.
+"""
+import codecs
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+# Tamanho aproximado (em bytes) dos blocos gerados por iter_dumps
+CHUNK_SIZE = 64 * 1024
+
+# Espaços entre os tokens do JSON
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Caracteres que ainda podem continuar um número
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+
+_DECODER = json.JSONDecoder()
+
+# Caracteres que o json padrão escapa com ensure_ascii=True e o orjson não
+_NON_ASCII = re.compile('[^\x00-\x7e]')
+
+
+def _escape_non_ascii(match):
+    """Mesmo escape \\uXXXX do json padrão (par de surrogates acima do BMP)"""
+    n = ord(match.group())
+    if n < 0x10000:
+        return '\\u{0:04x}'.format(n)
+    n -= 0x10000
+    return '\\u{0:04x}\\u{1:04x}'.format(0xd800 | (n >> 10), 0xdc00 | (n & 0x3ff))
+
+
+def _orjson_option(indent, separators, sort_keys):
+    """Opção do orjson equivalente aos argumentos, ou None se não houver"""
+    if indent is None:
+        if separators is None or tuple(separators) != (',', ':'):
+            return None
+        option = 0
+    elif indent == 2 and (separators is None or tuple(separators) == (',', ': ')):
+        option = orjson.OPT_INDENT_2
+    else:
+        return None
+    # Datas e dataclasses passam pelo 'default', como no json padrão
+    option |= orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return option
+
+
+def _fast_dumpb(obj, option, ensure_ascii, default):
+    """Serializa com o orjson; retorna None quando ele não consegue reproduzir o json padrão"""
+    try:
+        data = orjson.dumps(obj, default=default, option=option)
+    except orjson.JSONEncodeError:
+        return None
+    if ensure_ascii and (not data.isascii() or b"\x7f" in data):
+        data = _NON_ASCII.sub(_escape_non_ascii, data.decode('utf-8')).encode('ascii')
+    return data
+
+
+def dumpb(obj, *, indent=None, separators=None, ensure_ascii=True, sort_keys=False, default=None, **kwargs):
+    """Como json.dumps, mas retorna bytes UTF-8"""
+    if orjson is not None and not kwargs:
+        option = _orjson_option(indent, separators, sort_keys)
+        if option is not None:
+            data = _fast_dumpb(obj, option, ensure_ascii, default)
+            if data is not None:
+                return data
+    return json.dumps(
+        obj, indent=indent, separators=separators, ensure_ascii=ensure_ascii, sort_keys=sort_keys,
+        default=default, **kwargs,
+    ).encode('utf-8')
+
+
+def dumps(obj, *, indent=None, separators=None, ensure_ascii=True, sort_keys=False, default=None, **kwargs):
+    """Substituto de json.dumps"""
+    if orjson is not None and not kwargs:
+        option = _orjson_option(indent, separators, sort_keys)
+        if option is not None:
+            data = _fast_dumpb(obj, option, ensure_ascii, default)
+            if data is not None:
+                return data.decode('utf-8')
+    return json.dumps(
+        obj, indent=indent, separators=separators, ensure_ascii=ensure_ascii, sort_keys=sort_keys,
+        default=default, **kwargs,
+    )
+
+
+def iter_dumps(obj, *, indent=None, separators=None, ensure_ascii=True, default=None, chunk_size=CHUNK_SIZE):
+    """Gera a mesma saída de dumpb em blocos de aproximadamente chunk_size bytes
+
+    Com o json padrão usa iterencode. Com o orjson, o dict de nível mais alto
+    e as suas listas são escritos aqui e cada item é serializado à parte,
+    então a memória usada fica limitada ao maior item (ex.: uma área do .rwp).
+    """
+    option = _orjson_option(indent, separators, False) if orjson is not None else None
+    if option is None:
+        pieces = _iter_stdlib(obj, indent, separators, ensure_ascii, default)
+    else:
+        pieces = _iter_fast(obj, option, indent, separators, ensure_ascii, default)
+
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= chunk_size:
+            yield b"".join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def _iter_stdlib(obj, indent, separators, ensure_ascii, default):
+    encoder = json.JSONEncoder(indent=indent, separators=separators, ensure_ascii=ensure_ascii, default=default)
+    for piece in encoder.iterencode(obj):
+        yield piece.encode('utf-8')
+
+
+def _iter_fast(obj, option, indent, separators, ensure_ascii, default):
+    def encode(value, depth):
+        data = _fast_dumpb(value, option, ensure_ascii, default)
+        if data is None:
+            data = json.dumps(
+                value, indent=indent, separators=separators, ensure_ascii=ensure_ascii, default=default,
+            ).encode('utf-8')
+        if indent and depth:
+            # Quebras de linha só aparecem na indentação (dentro de strings são escapadas)
+            data = data.replace(b"\n", b"\n" + b"  " * depth)
+        return data
+
+    if not isinstance(obj, dict) or not obj or not all(isinstance(key, str) for key in obj):
+        yield encode(obj, 0)
+        return
+
+    newline1 = b"\n  " if indent else b""
+    newline2 = b"\n    " if indent else b""
+    key_separator = b": " if indent else b":"
+    yield b"{"
+    for i, (key, value) in enumerate(obj.items()):
+        yield (b"," if i else b"") + newline1 + encode(key, 0) + key_separator
+        if isinstance(value, (list, tuple)) and value:
+            yield b"["
+            for j, item in enumerate(value):
+                yield (b"," if j else b"") + newline2 + encode(item, 2)
+            yield newline1 + b"]"
+        else:
+            yield encode(value, 1)
+    yield (b"\n" if indent else b"") + b"}"
+
+
+def loads(data):
+    """Substituto de json.loads (str ou bytes)"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN, inteiros grandes etc.: o json padrão decide
+            pass
+    return json.loads(data)
+
+
+def load(fileobj):
+    """Substituto de json.load"""
+    return loads(fileobj.read())
+
+
+class _StreamReader:
+    """Texto de um arquivo binário UTF-8 lido em blocos, com um buffer só do trecho ainda não lido"""
+
+    def __init__(self, fileobj, chunk_size):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        # Lê pelo menos o tamanho do que já está pendente, para que um valor
+        # grande não seja decodificado de novo a cada bloco
+        data = self.fileobj.read(max(self.chunk_size, len(self.buffer) - self.pos))
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.eof = not data
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(data, final=self.eof)
+        self.pos = 0
+
+    def peek(self):
+        """Próximo caractere depois dos espaços, sem consumi-lo ('' no fim do arquivo)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return ''
+            self.fill()
+
+    def expect(self, chars):
+        """Consome um dos caracteres de 'chars' e o retorna"""
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expecting {' or '.join(map(repr, chars))}", self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decodifica o próximo valor JSON completo"""
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Valor incompleto no fim do buffer
+                if self.eof:
+                    raise
+                self.fill()
+                continue
+            if (not self.eof and isinstance(obj, (int, float))
+                    and _NUMBER_TAIL.match(self.buffer, end).end() == len(self.buffer)):
+                # Um número no fim do buffer pode continuar no próximo bloco
+                self.fill()
+                continue
+            self.pos = end
+            return obj
+
+    def iter_pairs(self, arrays):
+        """Pares (chave, valor) do objeto na posição atual; ver iter_object"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise json.JSONDecodeError("Expecting property name enclosed in double quotes", self.buffer, self.pos)
+            key = self.value()
+            self.expect(':')
+            if key in arrays and self.peek() == '[':
+                items = self.iter_array(arrays[key] if isinstance(arrays, dict) else None)
+                yield key, items
+                for _ in items:
+                    pass
+            else:
+                yield key, self.value()
+            if self.expect(',}') == '}':
+                return
+
+    def iter_array(self, item_arrays=None):
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            if item_arrays and self.peek() == '{':
+                pairs = self.iter_pairs(item_arrays)
+                yield pairs
+                for _ in pairs:
+                    pass
+            else:
+                yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+
+def iter_object(fileobj, arrays=(), chunk_size=CHUNK_SIZE):
+    """Lê um objeto JSON de um arquivo em blocos, gerando pares (chave, valor)
+
+    Quando a chave está em 'arrays' e o valor é uma lista, o valor gerado é um
+    iterador que lê um item por vez; como em itertools.groupby, ele deve ser
+    consumido antes do próximo par (o que sobrar é descartado). Assim a memória
+    usada fica limitada ao maior item. Os demais valores são lidos inteiros.
+
+    'arrays' também pode ser um dict {chave: arrays dos itens}: cada item que
+    for um objeto é então gerado, por sua vez, como um iterador de pares, e
+    a leitura desce na árvore, ex.: {'Areas': {'SubItems': {'LoadOutputs': None}}}.
+    """
+    reader = _StreamReader(fileobj, chunk_size)
+    yield from reader.iter_pairs(arrays)
+    if reader.peek():
+        raise json.JSONDecodeError("Extra data", reader.buffer, reader.pos)
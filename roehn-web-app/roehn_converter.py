@@ -1,89 +1,1051 @@
 # roehn_converter.py
-import json
 import csv
 import uuid
 import io
+import gzip
+import zlib
+import logging
+import time
 from datetime import datetime
 
+import json_backend
+
+logger = logging.getLogger(__name__)
+
+# Primeiro Unit ID usado pelos UnitComposers do M4, conforme o Roehn Wizard
+FIRST_UNIT_ID = 39
+
+# Tamanho aproximado (em bytes) dos blocos gerados por export_project_stream
+EXPORT_CHUNK_SIZE = json_backend.CHUNK_SIZE
+
+# Linhas do CSV processadas por lote em process_csv_stream
+CSV_BATCH_SIZE = 1000
+
+# Modos de saída do .rwp: indentado (padrão), compacto e compacto com gzip
+EXPORT_MODES = ('pretty', 'compact', 'gzip')
+GZIP_LEVEL = 6
+
+# GUID usado pelo Roehn Wizard para posições de slot vazias
+EMPTY_GUID = "00000000-0000-0000-0000-000000000000"
+
+# Endereço HSNET mínimo: novos módulos recebem sempre endereços acima dele
+MIN_HSNET_ADDRESS = 100
+
+# Namespace dos GUIDs derivados no modo determinístico (uuid5 de semente + caminho)
+GUID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "roehn-project-manager:rwp")
+
+# Listas do .rwp lidas item a item por parse_rwp (ver json_backend.iter_object)
+RWP_STREAM_ARRAYS = {
+    "Areas": {"SubItems": {"LoadOutputs": None, "AutomationBoards": {"ModulesList": None}}},
+}
+
+# Data usada no modo determinístico quando o project_info não traz 'timestamp'
+DETERMINISTIC_TIMESTAMP = "2000-01-01T00:00:00"
+
+# Definições dos drivers de módulo. 'slot_layout' lista (Name, SlotCapacity,
+# SlotType, IO) e 'unit_composers' os UnitComposers que recebem Unit IDs próprios.
+MODULES_INFO = {
+    'ADP-RL12': {
+        'driver_guid': '80000000-0000-0000-0000-000000000006',
+        'slots': {'Load ON/OFF': 12},
+        'module_type': 'Module',
+        'slot_layout': [('Load ON/OFF', 12, 1, 1), ('PNET', 6, 6, 1)],
+        'unit_composers': None,
+    },
+    'RL4': {
+        'driver_guid': '80000000-0000-0000-0000-000000000010',
+        'slots': {'Load ON/OFF': 4},
+        'module_type': 'Module',
+        'slot_layout': [('Load ON/OFF', 4, 1, 1)],
+        'unit_composers': None,
+    },
+    'LX4': {
+        'driver_guid': '80000000-0000-0000-0000-000000000003',
+        'slots': {'Shade': 4},
+        'module_type': 'Module',
+        'slot_layout': [('Shade', 4, 7, 1), ('PNET', 6, 6, 0)],
+        'unit_composers': [
+            {"Name": f"Opening Percentage {i+1} {j+1}", "PortNumber": 1 if j % 2 == 0 else 5, "PortType": 6,
+             "NotProgrammable": False, "Kind": 1, "IO": 1 if j % 2 == 0 else 0}
+            for i in range(4) for j in range(4)
+        ],
+    },
+    'SA1': {
+        'driver_guid': '80000000-0000-0000-0000-000000000013',
+        'slots': {'IR': 1},
+        'module_type': 'ModuleHVAC',
+        'slot_layout': [('IR', 1, 4, 1)],
+        'unit_composers': [
+            {"Name": "Power", "PortNumber": 1, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
+            {"Name": "Mode", "PortNumber": 2, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
+            {"Name": "Fan Speed", "PortNumber": 4, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
+            {"Name": "Swing", "PortNumber": 5, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
+            {"Name": "Temp Up", "PortNumber": 11, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
+            {"Name": "Temp Down", "PortNumber": 12, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
+            {"Name": "Display/Light", "PortNumber": 3, "PortType": 100, "NotProgrammable": False, "Kind": 0, "IO": 1},
+        ],
+    },
+    'DIM8': {
+        'driver_guid': '80000000-0000-0000-0000-000000000001',
+        'slots': {'Load Dim': 8},
+        'module_type': 'Module',
+        'slot_layout': [('Load Dim', 8, 2, 1), ('PNET', 6, 6, 1)],
+        'unit_composers': None,
+    },
+}
+
+# Modelo do driver -> tipo de módulo usado no banco (MODULO_INFO do app)
+DB_MODULE_TYPES = {'ADP-RL12': 'RL12', 'RL4': 'RL4', 'LX4': 'LX4', 'SA1': 'SA1', 'DIM8': 'DIM8'}
+
+# $type dos itens de LoadOutputs -> tipo de circuito no banco
+RWP_CIRCUIT_TYPES = {'Circuit': 'luz', 'Shade': 'persiana', 'HVAC': 'hvac'}
+
+# SpecialActions padrão de projetos, áreas e ambientes: (Name, Type)
+SPECIAL_ACTIONS = (
+    ("All HVAC", 4),
+    ("All Lights", 2),
+    ("All Shades", 3),
+    ("OFF", 0),
+    ("Volume", 1),
+)
+
+UNIT_TEMPLATE = {
+    "$type": "Unit",
+    "Id": 0,
+    "Event": 0,
+    "Scene": 0,
+    "Disabled": False,
+    "Logged": False,
+    "Memo": False,
+    "Increment": False
+}
+
+AREA_TEMPLATE = {
+    "$type": "Area",
+    "Scenes": None,
+    "Scripts": None,
+    "Variables": None,
+    "SpecialActions": None,
+    "Guid": None,
+    "Name": None,
+    "Notes": "",
+    "NotDisplayOnROEHNApp": False,
+    "SubItems": None
+}
+
+ROOM_TEMPLATE = {
+    "$type": "Room",
+    "NotDisplayOnROEHNApp": False,
+    "Name": None,
+    "Notes": None,
+    "Scenes": None,
+    "Scripts": None,
+    "Variables": None,
+    "LoadOutputs": None,
+    "UserInterfaces": None,
+    "AutomationBoards": None,
+    "SpecialActions": None,
+    "Guid": None
+}
+
+
+# Tipo de circuito -> slots do módulo que podem receber o item, em ordem de preferência
+LINK_SLOTS = {
+    'luz': ('Load ON/OFF', 'Load Dim'),
+    'persiana': ('Shade',),
+    'hvac': ('IR',),
+}
+
+# Tipo de circuito do banco -> (método que cria o item, método que o vincula ao módulo)
+CIRCUIT_BUILDERS = {
+    'luz': ('_add_load', '_link_load_to_module'),
+    'persiana': ('_add_shade', '_link_shade_to_module'),
+    'hvac': ('_add_hvac', '_link_hvac_to_module'),
+}
+
+
+def new_db_index():
+    """Índice vazio que liga as linhas do banco (por ID) aos itens gerados no projeto"""
+    return {'areas': {}, 'ambientes': {}, 'modulos': {}, 'circuitos': {}}
+
+
+def random_guid(*path):
+    """Gera um GUID aleatório; o caminho só é usado no modo determinístico"""
+    return str(uuid.uuid4())
+
+
+def new_special_actions(new_guid=random_guid, *owner):
+    """Monta a lista padrão de SpecialActions com GUIDs novos"""
+    return special_actions_rwp(new_special_action_guids(new_guid, *owner))
+
+
+def new_special_action_guids(new_guid=random_guid, *owner):
+    """GUIDs das SpecialActions padrão, na ordem de SPECIAL_ACTIONS"""
+    return [new_guid(*owner, "SpecialAction", name) for name, _ in SPECIAL_ACTIONS]
+
+
+def special_actions_rwp(guids):
+    """Lista de SpecialActions do Roehn Wizard a partir dos GUIDs"""
+    return [
+        {"$type": "SpecialAction", "Name": name, "Guid": guid, "Type": action_type}
+        for (name, action_type), guid in zip(SPECIAL_ACTIONS, guids)
+    ]
+
+
+def new_area(name, new_guid=random_guid):
+    """Cria uma área vazia"""
+    special_actions = new_special_action_guids(new_guid, "Area", name)
+    return Area(name, new_guid("Area", name), special_actions)
+
+
+def new_room(area_name, name, automation_boards=None, new_guid=random_guid):
+    """Cria um ambiente vazio"""
+    special_actions = new_special_action_guids(new_guid, "Room", area_name, name)
+    return Room(name, new_guid("Room", area_name, name), special_actions, automation_boards)
+
+
+def rwp_default(obj):
+    """Hook 'default' do encoder JSON: serializa os objetos do modelo no formato do Roehn Wizard"""
+    try:
+        return obj.to_rwp()
+    except AttributeError:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable") from None
+
+
+def state_default(obj):
+    """Hook 'default' de export_state: como rwp_default, mas na forma compacta dos objetos que a têm"""
+    to_state = getattr(obj, 'to_state', None)
+    return to_state() if to_state is not None else rwp_default(obj)
+
+
+# Modelo intermediário do conversor. Os itens do projeto são objetos com
+# __slots__ que guardam só os campos variáveis; o dict no formato do Roehn
+# Wizard ($type e constantes) é montado por to_rwp() durante a exportação,
+# um objeto por vez, e from_rwp() faz o caminho inverso para estados salvos.
+
+class Unit:
+    __slots__ = ('id',)
+
+    def __init__(self, unit_id):
+        self.id = unit_id
+
+    def to_rwp(self):
+        return dict(UNIT_TEMPLATE, Id=self.id)
+
+    def to_state(self):
+        return self.id
+
+    @classmethod
+    def from_rwp(cls, data):
+        if data is None:
+            return None
+        # Estados salvos guardam só o ID
+        return cls(data if isinstance(data, int) else data["Id"])
+
+
+class Load:
+    __slots__ = ('name', 'guid', 'unit', 'power', 'description')
+    rwp_type = "Circuit"
+
+    def __init__(self, name, guid, unit, power=0.0, description="ON/OFF"):
+        self.name = name
+        self.guid = guid
+        self.unit = unit
+        self.power = power
+        self.description = description
+
+    def units(self):
+        return (self.unit,)
+
+    def to_rwp(self):
+        return {
+            "$type": "Circuit",
+            "LoadType": 0,
+            "IconPath": 0,
+            "Power": self.power,
+            "ProfileGuid": "10000000-0000-0000-0000-000000000001",
+            "Unit": self.unit,
+            "Name": self.name,
+            "Guid": self.guid,
+            "Description": self.description
+        }
+
+    @classmethod
+    def from_rwp(cls, data):
+        return cls(data["Name"], data["Guid"], Unit.from_rwp(data["Unit"]), data["Power"], data["Description"])
+
+
+class Shade:
+    __slots__ = ('name', 'guid', 'unit_movement', 'unit_opened_percentage', 'unit_current_position', 'description')
+    rwp_type = "Shade"
+
+    def __init__(self, name, guid, unit_movement, unit_opened_percentage, unit_current_position,
+                 description="Persiana"):
+        self.name = name
+        self.guid = guid
+        self.unit_movement = unit_movement
+        self.unit_opened_percentage = unit_opened_percentage
+        self.unit_current_position = unit_current_position
+        self.description = description
+
+    def units(self):
+        return (self.unit_movement, self.unit_opened_percentage, self.unit_current_position)
+
+    def to_rwp(self):
+        return {
+            "$type": "Shade",
+            "ShadeType": 0,
+            "ShadeIcon": 0,
+            "ProfileGuid": "20000000-0000-0000-0000-000000000001",
+            "UnitMovement": self.unit_movement,
+            "UnitOpenedPercentage": self.unit_opened_percentage,
+            "UnitCurrentPosition": self.unit_current_position,
+            "Name": self.name,
+            "Guid": self.guid,
+            "Description": self.description
+        }
+
+    @classmethod
+    def from_rwp(cls, data):
+        return cls(
+            data["Name"], data["Guid"], Unit.from_rwp(data["UnitMovement"]),
+            Unit.from_rwp(data["UnitOpenedPercentage"]), Unit.from_rwp(data["UnitCurrentPosition"]),
+            data["Description"],
+        )
+
+
+class Hvac:
+    __slots__ = ('name', 'guid', 'description')
+    rwp_type = "HVAC"
+
+    def __init__(self, name, guid, description="HVAC"):
+        self.name = name
+        self.guid = guid
+        self.description = description
+
+    def units(self):
+        return ()
+
+    def to_rwp(self):
+        return {
+            "$type": "HVAC",
+            "ProfileGuid": "14000000-0000-0000-0000-000000000001",
+            "ControlModelGuid": "17000000-0000-0000-0000-000000000001",
+            "Unit": None,
+            "Name": self.name,
+            "Guid": self.guid,
+            "Description": self.description
+        }
+
+    @classmethod
+    def from_rwp(cls, data):
+        return cls(data["Name"], data["Guid"], data["Description"])
+
+
+# $type dos itens de LoadOutputs -> classe do modelo
+LOAD_OUTPUT_CLASSES = {cls.rwp_type: cls for cls in (Load, Shade, Hvac)}
+
+
+class Room:
+    __slots__ = ('name', 'guid', 'special_actions', 'load_outputs', 'automation_boards')
+
+    def __init__(self, name, guid, special_actions, automation_boards=None, load_outputs=None):
+        self.name = name
+        self.guid = guid
+        self.special_actions = special_actions
+        self.load_outputs = load_outputs if load_outputs is not None else []
+        self.automation_boards = automation_boards or []
+
+    def to_rwp(self):
+        return dict(
+            ROOM_TEMPLATE, Name=self.name, Scenes=[], Scripts=[], Variables=[], LoadOutputs=self.load_outputs,
+            UserInterfaces=[], AutomationBoards=self.automation_boards,
+            SpecialActions=special_actions_rwp(self.special_actions), Guid=self.guid,
+        )
+
+    @classmethod
+    def from_rwp(cls, data):
+        boards = [
+            dict(board, ModulesList=[Module.from_rwp(module) for module in board["ModulesList"]])
+            for board in data["AutomationBoards"]
+        ]
+        load_outputs = [LOAD_OUTPUT_CLASSES[item["$type"]].from_rwp(item) for item in data["LoadOutputs"]]
+        special_actions = [action["Guid"] for action in data["SpecialActions"]]
+        return cls(data["Name"], data["Guid"], special_actions, boards, load_outputs)
+
+
+class Area:
+    __slots__ = ('name', 'guid', 'special_actions', 'rooms')
+
+    def __init__(self, name, guid, special_actions, rooms=None):
+        self.name = name
+        self.guid = guid
+        self.special_actions = special_actions
+        self.rooms = rooms if rooms is not None else []
+
+    def to_rwp(self):
+        return dict(
+            AREA_TEMPLATE, Scenes=[], Scripts=[], Variables=[],
+            SpecialActions=special_actions_rwp(self.special_actions),
+            Guid=self.guid, Name=self.name, SubItems=self.rooms,
+        )
+
+    @classmethod
+    def from_rwp(cls, data):
+        special_actions = [action["Guid"] for action in data["SpecialActions"]]
+        rooms = [Room.from_rwp(room) for room in data["SubItems"]]
+        return cls(data["Name"], data["Guid"], special_actions, rooms)
+
+
+class Slot:
+    __slots__ = ('name', 'capacity', 'slot_type', 'initial_port', 'io', 'sub_items')
+
+    def __init__(self, name, capacity, slot_type, io, sub_items=None, initial_port=1):
+        self.name = name
+        self.capacity = capacity
+        self.slot_type = slot_type
+        self.initial_port = initial_port
+        self.io = io
+        self.sub_items = sub_items if sub_items is not None else [EMPTY_GUID] * capacity
+
+    def to_rwp(self):
+        return {
+            "$type": "Slot",
+            "SlotCapacity": self.capacity,
+            "SlotType": self.slot_type,
+            "InitialPort": self.initial_port,
+            "IO": self.io,
+            "UnitComposers": None,
+            "SubItemsGuid": self.sub_items,
+            "Name": self.name
+        }
+
+    @classmethod
+    def from_rwp(cls, data):
+        return cls(data["Name"], data["SlotCapacity"], data["SlotType"], data["IO"],
+                   data["SubItemsGuid"], data["InitialPort"])
+
+
+class Module:
+    """Módulo de um quadro; 'base' é o dict fixo do driver, compartilhado entre instâncias
+
+    Módulos criados a partir de um ModuleTemplate montam os UnitComposers na
+    exportação a partir de first_unit_id; nos demais (ex.: o M4) os
+    UnitComposers já estão em 'base'.
+    """
+    __slots__ = ('base', 'composers', 'name', 'guid', 'hsnet_address', 'dev_id', 'slots', 'first_unit_id')
+
+    def __init__(self, base, name, guid, hsnet_address, dev_id, slots, composers=None, first_unit_id=None):
+        self.base = base
+        self.composers = composers
+        self.name = name
+        self.guid = guid
+        self.hsnet_address = hsnet_address
+        self.dev_id = dev_id
+        self.slots = slots
+        self.first_unit_id = first_unit_id
+
+    def unit_ids(self):
+        """Unit IDs usados pelos UnitComposers do módulo"""
+        if self.composers:
+            return range(self.first_unit_id, self.first_unit_id + len(self.composers))
+        composers = self.base.get("UnitComposers") or []
+        for group in self.base.get("SubItemComposers") or []:
+            composers = composers + (group or [])
+        return [composer["Unit"]["Id"] for composer in composers if composer.get("Unit")]
+
+    def to_rwp(self):
+        module = dict(
+            self.base, Name=self.name, Guid=self.guid, HsnetAddress=self.hsnet_address, DevID=self.dev_id,
+            Slots=self.slots,
+        )
+        if self.composers:
+            unit_composers = [
+                dict(composer, Unit=dict(UNIT_TEMPLATE, Id=self.first_unit_id + i))
+                for i, composer in enumerate(self.composers)
+            ]
+            if "SubItemComposers" in self.base:
+                module["SubItemComposers"] = [unit_composers]
+                module["GTWItemComposers"] = []
+            else:
+                module["UnitComposers"] = unit_composers
+        return module
+
+    def to_state(self):
+        """Forma usada por export_state: módulos de template guardam só os campos da instância"""
+        template = MODULE_TEMPLATES_BY_DRIVER.get(self.base.get("DriverGuid"))
+        if template is None or template.base is not self.base:
+            return self.to_rwp()
+        return {
+            "Template": self.base["DriverGuid"], "Name": self.name, "Guid": self.guid,
+            "HsnetAddress": self.hsnet_address, "DevID": self.dev_id, "FirstUnitId": self.first_unit_id,
+            "Slots": self.slots,
+        }
+
+    @classmethod
+    def from_rwp(cls, data):
+        slots = [Slot.from_rwp(slot) for slot in data["Slots"] or []]
+        if "Template" in data:
+            template = MODULE_TEMPLATES_BY_DRIVER[data["Template"]]
+            return cls(template.base, data["Name"], data["Guid"], data["HsnetAddress"], data["DevID"], slots,
+                       template.composers or None, data["FirstUnitId"])
+        return cls(dict(data, Slots=None), data["Name"], data["Guid"], data["HsnetAddress"], data["DevID"], slots)
+
+
+class ModuleTemplate:
+    """Módulo pré-montado a partir de MODULES_INFO.
+
+    A estrutura fixa (chaves e UnitComposers) é montada uma vez por processo
+    e compartilhada pelos módulos; stamp() só preenche os campos da instância.
+    """
+
+    def __init__(self, info):
+        composers = info['unit_composers']
+        self.unit_count = len(composers) if composers else 0
+        # "Unit" vem logo após "Name", na ordem usada pelo Roehn Wizard
+        self.composers = [
+            dict({"$type": "UnitComposer", "Name": c["Name"], "Unit": None}, **c, Value=0)
+            for c in composers or ()
+        ]
+        self.slot_layout = info['slot_layout']
+        self.hvac = info['module_type'] == 'ModuleHVAC'
+        base = {"$type": info['module_type']}
+        if self.hvac:
+            base.update({"SubItemComposers": None, "GTWItemComposers": None})
+        base.update({
+            "Name": None,
+            "DriverGuid": info['driver_guid'],
+            "Guid": None,
+            "IpAddress": "",
+            "HsnetAddress": None,
+            "PollTiming": 0,
+            "Disabled": False,
+            "RemotePort": 0,
+            "RemoteIpAddress": "",
+            "Notes": None,
+            "Logicserver": False,
+            "DevID": None,
+            "DevIDSlave": 0,
+        })
+        if not self.hvac:
+            base["UnitComposers"] = None
+        base.update({
+            "Slots": None,
+            "SmartGroup": 1,
+            "UserInterfaceGuid": EMPTY_GUID,
+            "PIRSensorReportEnable": False,
+            "PIRSensorReportID": 0
+        })
+        self.base = base
+
+    def stamp(self, name, guid, hsnet_address, dev_id, first_unit_id=None):
+        """Cria uma nova instância do módulo"""
+        slots = [
+            Slot(slot_name, capacity, slot_type, io_mode)
+            for slot_name, capacity, slot_type, io_mode in self.slot_layout
+        ]
+        return Module(self.base, name, guid, hsnet_address, dev_id, slots, self.composers or None, first_unit_id)
+
+
+MODULE_TEMPLATES = {model: ModuleTemplate(info) for model, info in MODULES_INFO.items()}
+MODULE_TEMPLATES_BY_DRIVER = {template.base["DriverGuid"]: template for template in MODULE_TEMPLATES.values()}
+
+
+def _remove_node(nodes, node):
+    """Remove um nó da lista pela identidade (list.remove compararia dicts inteiros)"""
+    for position, candidate in enumerate(nodes):
+        if candidate is node:
+            del nodes[position]
+            return
+
+
+def _unique_name(name, used):
+    """Retorna name, ou name com sufixo numérico se já estiver em used; registra o resultado"""
+    candidate = name
+    suffix = 2
+    while candidate in used:
+        candidate = f"{name} ({suffix})"
+        suffix += 1
+    used.add(candidate)
+    return candidate
+
+
+class AddressAllocator:
+    """Aloca endereços inteiros (HSNET, DevID) em tempo constante.
+
+    Guarda os endereços em uso em um conjunto e mantém uma marca d'água com o
+    maior endereço usado; novos endereços são entregues logo acima dela,
+    pulando os que estiverem reservados.
+    """
+
+    def __init__(self, floor=0):
+        self.high_water = floor
+        self.used = set()
+
+    def __contains__(self, address):
+        return address in self.used
+
+    def mark_used(self, address):
+        """Registra um endereço já atribuído a um módulo existente"""
+        self.used.add(address)
+        if address > self.high_water:
+            self.high_water = address
+
+    def reserve(self, first, last=None):
+        """Reserva a faixa [first, last] sem mover a marca d'água"""
+        for address in range(first, (first if last is None else last) + 1):
+            self.used.add(address)
+
+    def allocate(self):
+        """Retorna o próximo endereço livre acima da marca d'água"""
+        address = self.high_water + 1
+        while address in self.used:
+            address += 1
+        self.mark_used(address)
+        return address
+
+
 class RoehnProjectConverter:
-    def __init__(self):
+    def __init__(self, debug=False):
         self.project_data = None
-        self.modules_info = {
-            'ADP-RL12': {'driver_guid': '80000000-0000-0000-0000-000000000006', 'slots': {'Load ON/OFF': 12}},
-            'RL4': {'driver_guid': '80000000-0000-0000-0000-000000000010', 'slots': {'Load ON/OFF': 4}},
-            'LX4': {'driver_guid': '80000000-0000-0000-0000-000000000003', 'slots': {'Shade': 4}},
-            'SA1': {'driver_guid': '80000000-0000-0000-0000-000000000013', 'slots': {'IR': 1}},
-            'DIM8': {'driver_guid': '80000000-0000-0000-0000-000000000001', 'slots': {'Load Dim': 8}}
-        }
+        # Em modo debug, cada alocação de Unit ID é conferida contra a árvore inteira
+        self.debug = debug
+        self._next_unit_id = FIRST_UNIT_ID
+        self._hsnet_allocator = AddressAllocator(MIN_HSNET_ADDRESS)
+        self._dev_id_allocator = AddressAllocator()
+        # Índices nome -> nó do projeto, mantidos junto com project_data
+        self._areas_by_name = {}
+        self._rooms_by_key = {}
+        # nome do módulo -> {nome do slot -> SubItemsGuid} e posição livre no ACNET do M4
+        self._module_slots = {}
+        self._acnet_slot = None
+        self._acnet_free = 0
+        # Contadores do resumo registrado ao fim de cada conversão
+        self._stats = {'loads': 0, 'shades': 0, 'hvac': 0, 'skipped': 0}
+        # Namespace do modo determinístico (None = GUIDs aleatórios) e quantas
+        # vezes cada caminho já gerou um GUID, para desempatar nomes repetidos
+        self._guid_namespace = None
+        self._guid_paths = {}
+        # Índice das linhas do banco usadas na última geração (ver export_state)
+        # e GUID -> (item, ambiente) dos circuitos gerados a partir dele
+        self._db_index = None
+        self._items_by_guid = {}
+        self.modules_info = MODULES_INFO
 
     def process_db_project(self, projeto):
-        """Processa os dados do projeto do banco de dados para o formato Roehn"""
-        print(f"Processando projeto: {projeto.nome}")
-        print(f"Número de áreas: {len(projeto.areas)}")
+        """Processa os dados do projeto do banco de dados para o formato Roehn
+
+        Aceita o snapshot de database.load_project_snapshot (ou qualquer objeto
+        com a mesma estrutura de areas/ambientes/circuitos/modulos).
+        """
+        debug = logger.isEnabledFor(logging.DEBUG)
+        phases = {}
+        started = time.perf_counter()
+        if debug:
+            logger.debug("Processando projeto: %s (%d áreas)", projeto.nome, len(projeto.areas))
         
+        index = self._db_index = new_db_index()
+        self._items_by_guid = {}
+
         # Primeiro, criar todas as áreas e ambientes
         for area in projeto.areas:
-            print(f"Processando área: {area.nome}")
+            index['areas'][str(area.id)] = area.nome
+            if debug:
+                logger.debug("Processando área: %s", area.nome)
             # Garantir que a área existe no projeto Roehn
             self._ensure_area_exists(area.nome)
             
             for ambiente in area.ambientes:
-                print(f"Processando ambiente: {ambiente.nome}")
+                if debug:
+                    logger.debug("Processando ambiente: %s", ambiente.nome)
                 # Garantir que o ambiente existe na área
                 self._ensure_room_exists(area.nome, ambiente.nome)
+                index['ambientes'][str(ambiente.id)] = [area.nome, ambiente.nome]
+        phases['areas'] = time.perf_counter() - started
         
         # Depois, garantir que todos os módulos existam
+        started = time.perf_counter()
         for modulo in projeto.modulos:
-            print(f"Processando módulo: {modulo.nome} ({modulo.tipo})")
+            if debug:
+                logger.debug("Processando módulo: %s (%s)", modulo.nome, modulo.tipo)
             # Garantir que o módulo existe no projeto Roehn - USAR O NOME REAL
             self._ensure_module_exists(modulo.tipo, modulo.nome)  # Alteração aqui
+            index['modulos'][str(modulo.id)] = [modulo.nome, modulo.tipo]
+        phases['modulos'] = time.perf_counter() - started
         
         # Finalmente, processar os circuitos
+        started = time.perf_counter()
         for area in projeto.areas:
             for ambiente in area.ambientes:
                 for circuito in ambiente.circuitos:
-                    print(f"Processando circuito: {circuito.identificador} ({circuito.tipo})")
-                    
                     # Verificar se o circuito está vinculado
                     if circuito.vinculacao:
-                        vinculacao = circuito.vinculacao
-                        modulo = vinculacao.modulo
-                        canal = vinculacao.canal
-                        # USAR O NOME REAL DO MÓDULO EM VEZ DE GERAR UM
-                        modulo_nome = modulo.nome  # Alteração aqui
-                        
-                        print(f"Circuito vinculado ao módulo: {modulo_nome}, canal: {canal}")
-                        
-                        try:
-                            # Adicionar o circuito ao projeto Roehn
-                            if circuito.tipo == 'luz':
-                                guid = self._add_load(area.nome, ambiente.nome, circuito.nome or circuito.identificador)
-                                self._link_load_to_module(guid, modulo_nome, canal)
-                                print(f"Circuito de luz adicionado: {guid}")
-                            elif circuito.tipo == 'persiana':
-                                guid = self._add_shade(area.nome, ambiente.nome, circuito.nome or circuito.identificador)
-                                self._link_shade_to_module(guid, modulo_nome, canal)
-                                print(f"Circuito de persiana adicionado: {guid}")
-                            elif circuito.tipo == 'hvac':
-                                guid = self._add_hvac(area.nome, ambiente.nome, circuito.nome or circuito.identificador)
-                                self._link_hvac_to_module(guid, modulo_nome, canal)
-                                print(f"Circuito de HVAC adicionado: {guid}")
-                        except Exception as e:
-                            print(f"Erro ao processar circuito {circuito.id}: {e}")
-                            # Continuar processando outros circuitos mesmo se um falhar
-                            continue
+                        self._add_db_circuit(area.nome, ambiente, circuito, debug)
                     else:
-                        print(f"Circuito {circuito.id} não vinculado, ignorando.")
+                        self._stats['skipped'] += 1
+                        if debug:
+                            logger.debug("Circuito %s não vinculado, ignorando.", circuito.id)
+        phases['circuitos'] = time.perf_counter() - started
+
+        self._log_summary(projeto.nome, phases)
+
+    def _add_db_circuit(self, area_nome, ambiente, circuito, debug=False):
+        """Adiciona e vincula um circuito do banco, registrando-o no índice; retorna o GUID ou None"""
+        vinculacao = circuito.vinculacao
+        # USAR O NOME REAL DO MÓDULO EM VEZ DE GERAR UM
+        modulo_nome = vinculacao.modulo.nome
+        canal = vinculacao.canal
+        if debug:
+            logger.debug("Circuito %s (%s) vinculado ao módulo %s, canal %s",
+                         circuito.identificador, circuito.tipo, modulo_nome, canal)
+
+        builders = CIRCUIT_BUILDERS.get(circuito.tipo)
+        if builders is None:
+            self._stats['skipped'] += 1
+            return None
+        add, link = builders
+        nome = circuito.nome or circuito.identificador
+        try:
+            # Adicionar o circuito ao projeto Roehn
+            guid = getattr(self, add)(area_nome, ambiente.nome, nome, key=circuito.identificador)
+            getattr(self, link)(guid, modulo_nome, canal)
+        except Exception as e:
+            logger.warning("Erro ao processar circuito %s: %s", circuito.id, e)
+            self._stats['skipped'] += 1
+            # Continuar processando outros circuitos mesmo se um falhar
+            return None
+
+        room = self._rooms_by_key[(area_nome, ambiente.nome)]
+        self._items_by_guid[guid] = (room.load_outputs[-1], room)
+        self._db_index['circuitos'][str(circuito.id)] = {
+            'tipo': circuito.tipo,
+            'ambiente': str(ambiente.id),
+            'nome': nome,
+            'modulo': str(vinculacao.modulo.id),
+            'canal': canal,
+            'guid': guid,
+        }
+        return guid
+
+    def export_state(self):
+        """Retorna a árvore do projeto e o índice banco -> itens em JSON compacto (bytes), para load_state"""
+        if not self.project_data or self._db_index is None:
+            raise ValueError("Nenhum projeto gerado a partir do banco para exportar")
+        state = {
+            'project': self.project_data,
+            'index': dict(self._db_index, next_unit_id=self._next_unit_id),
+        }
+        return json_backend.dumpb(state, **dict(self._json_options('compact'), default=state_default))
+
+    def load_state(self, state):
+        """Retoma um projeto gerado antes (ver export_state) para atualizá-lo com update_db_project
+
+        Aceita o JSON de export_state ou o dict já decodificado.
+        """
+        if isinstance(state, (bytes, str)):
+            state = json_backend.loads(state)
+        project = state['project']
+        self.project_data = dict(project, Areas=[Area.from_rwp(area) for area in project["Areas"]])
+        index = state['index']
+        self._db_index = {key: index[key] for key in new_db_index()}
+        self._next_unit_id = index['next_unit_id']
+        self._guid_namespace = None
+        self._guid_paths = {}
+        self._stats = {'loads': 0, 'shades': 0, 'hvac': 0, 'skipped': 0}
+        self._index_areas_and_rooms()
+        self._items_by_guid = {
+            item.guid: (item, room)
+            for area in self.project_data["Areas"] for room in area.rooms for item in room.load_outputs
+        }
+
+        # Endereços já usados continuam reservados, inclusive os do M4
+        self._hsnet_allocator = AddressAllocator(MIN_HSNET_ADDRESS)
+        self._dev_id_allocator = AddressAllocator()
+        self._module_slots = {}
+        modules_list = self._modules_list()
+        for module in modules_list:
+            self._hsnet_allocator.mark_used(module.hsnet_address)
+            self._dev_id_allocator.mark_used(module.dev_id)
+            self._index_module(module)
+        self._acnet_slot = next(slot.sub_items for slot in modules_list[0].slots if slot.name == "ACNET")
+        self._acnet_free = self._acnet_slot.index(EMPTY_GUID)
+        return self.project_data
+
+    def update_db_project(self, projeto):
+        """Atualiza o projeto carregado com load_state para o estado atual do banco
+
+        As linhas alteradas são encontradas comparando o snapshot com o índice
+        da geração anterior; só os itens afetados são adicionados, removidos,
+        movidos ou revinculados. GUIDs e Unit IDs dos demais itens não mudam, e
+        os Unit IDs de itens removidos não são reaproveitados. Retorna as
+        contagens de itens adicionados, removidos e atualizados.
+        """
+        if self._db_index is None:
+            raise ValueError("Projeto não carregado. Chame load_state primeiro.")
+
+        started = time.perf_counter()
+        index = self._db_index
+        changes = {'added': 0, 'removed': 0, 'updated': 0}
+        tech_area = self.project_data["Areas"][0]
+        tech_room = tech_area.rooms[0]
+
+        # Áreas e ambientes renomeados mantêm o nó (e o GUID) quando o nome
+        # antigo não é mais usado e o novo ainda não existe
+        area_names = {str(area.id): area.nome for area in projeto.areas}
+        room_keys = {
+            str(ambiente.id): (area.nome, ambiente.nome)
+            for area in projeto.areas for ambiente in area.ambientes
+        }
+        current_areas = set(area_names.values())
+        current_rooms = set(room_keys.values())
+
+        renamed_areas = {}
+        for area_id, old_name in index['areas'].items():
+            new_name = area_names.get(area_id)
+            node = self._areas_by_name.get(old_name)
+            if (new_name is None or new_name == old_name or node is None or node is tech_area
+                    or old_name in current_areas or new_name in self._areas_by_name):
+                continue
+            node.name = new_name
+            del self._areas_by_name[old_name]
+            self._areas_by_name[new_name] = node
+            for room in node.rooms:
+                if self._rooms_by_key.get((old_name, room.name)) is room:
+                    del self._rooms_by_key[(old_name, room.name)]
+                    self._rooms_by_key[(new_name, room.name)] = room
+            renamed_areas[old_name] = new_name
+
+        moved_rooms = {}
+
+        def current_key(old_key):
+            """Chave atual do nó de um ambiente da geração anterior"""
+            old_key = (renamed_areas.get(old_key[0], old_key[0]), old_key[1])
+            return moved_rooms.get(old_key, old_key)
+
+        for ambiente_id, old_key in index['ambientes'].items():
+            old_key = current_key(tuple(old_key))
+            new_key = room_keys.get(ambiente_id)
+            node = self._rooms_by_key.get(old_key)
+            if (new_key is None or new_key == old_key or node is None or node is tech_room
+                    or old_key in current_rooms or new_key in self._rooms_by_key):
+                continue
+            old_area = self._areas_by_name[old_key[0]]
+            new_area = self._ensure_area_exists(new_key[0])
+            if new_area is not old_area:
+                _remove_node(old_area.rooms, node)
+                new_area.rooms.append(node)
+            node.name = new_key[1]
+            del self._rooms_by_key[old_key]
+            self._rooms_by_key[new_key] = node
+            moved_rooms[old_key] = new_key
+
+        for area in projeto.areas:
+            self._ensure_area_exists(area.nome)
+            for ambiente in area.ambientes:
+                self._ensure_room_exists(area.nome, ambiente.nome)
+
+        # Módulos: 'holders' diz em qual nó ficaram os vínculos antigos de cada
+        # módulo (None se o nó foi removido) e 'relink' quais módulos precisam
+        # ter todos os seus circuitos vinculados de novo
+        modules = {str(modulo.id): (modulo.nome, modulo.tipo) for modulo in projeto.modulos}
+        ids_by_module_name = {}
+        for modulo_id, (nome, _) in modules.items():
+            ids_by_module_name.setdefault(nome, set()).add(modulo_id)
+        holders = {}
+        relink = set()
+        for modulo_id, (old_nome, old_tipo) in index['modulos'].items():
+            new = modules.get(modulo_id)
+            if new == (old_nome, old_tipo):
+                holders[modulo_id] = old_nome
+                continue
+            # O nó antigo continua em uso se outro módulo do banco tem o mesmo nome
+            shared = bool(ids_by_module_name.get(old_nome, set()) - {modulo_id})
+            if new is not None and new[1] == old_tipo and not shared \
+                    and new[0] not in self._module_slots and old_nome in self._module_slots:
+                self._rename_module(old_nome, new[0])
+                holders[modulo_id] = new[0]
+                continue
+            relink.add(modulo_id)
+            if shared:
+                holders[modulo_id] = old_nome
+            else:
+                self._remove_module(old_nome)
+                holders[modulo_id] = None
+
+        for modulo in projeto.modulos:
+            self._ensure_module_exists(modulo.tipo, modulo.nome)
+
+        # Circuitos
+        old_circuits = index['circuitos']
+        seen = set()
+        for area in projeto.areas:
+            for ambiente in area.ambientes:
+                ambiente_id = str(ambiente.id)
+                room = self._rooms_by_key[(area.nome, ambiente.nome)]
+                # Os itens de um ambiente que manteve o nó já estão no lugar certo
+                old_key = index['ambientes'].get(ambiente_id)
+                in_place = old_key is not None and self._rooms_by_key.get(current_key(tuple(old_key))) is room
+                for circuito in ambiente.circuitos:
+                    circuito_id = str(circuito.id)
+                    seen.add(circuito_id)
+                    record = old_circuits.get(circuito_id)
+                    vinculacao = circuito.vinculacao
+                    if vinculacao is None or circuito.tipo not in CIRCUIT_BUILDERS:
+                        if record is not None:
+                            self._remove_db_circuit(circuito_id, holders)
+                            changes['removed'] += 1
+                        continue
+
+                    nome = circuito.nome or circuito.identificador
+                    modulo_id = str(vinculacao.modulo.id)
+                    # Circuito igual ao da geração anterior: o item não é tocado
+                    if (in_place and record is not None and record['ambiente'] == ambiente_id
+                            and record['tipo'] == circuito.tipo and record['nome'] == nome
+                            and record['modulo'] == modulo_id and record['canal'] == vinculacao.canal
+                            and modulo_id not in relink and record['guid'] in self._items_by_guid):
+                        continue
+
+                    item, old_room = (None, None)
+                    if record is not None and record['tipo'] == circuito.tipo:
+                        item, old_room = self._find_item(record)
+                    if item is None:
+                        if record is not None:
+                            self._remove_db_circuit(circuito_id, holders)
+                        if self._add_db_circuit(area.nome, ambiente, circuito) is not None:
+                            changes['added'] += 1
+                        continue
+
+                    updated = False
+                    if old_room is not room:
+                        _remove_node(old_room.load_outputs, item)
+                        room.load_outputs.append(item)
+                        self._items_by_guid[item.guid] = (item, room)
+                        updated = True
+                    if item.name != nome:
+                        item.name = nome
+                        updated = True
+                    if (record['modulo'] != modulo_id or record['canal'] != vinculacao.canal
+                            or modulo_id in relink):
+                        holder = holders.get(record['modulo'])
+                        if holder is not None:
+                            self._unlink_from_module(item.guid, holder, record['canal'])
+                        link = getattr(self, CIRCUIT_BUILDERS[circuito.tipo][1])
+                        link(item.guid, vinculacao.modulo.nome, vinculacao.canal)
+                        updated = True
+                    record.update(ambiente=ambiente_id, nome=nome, modulo=modulo_id, canal=vinculacao.canal)
+                    if updated:
+                        changes['updated'] += 1
+
+        for circuito_id in [cid for cid in old_circuits if cid not in seen]:
+            self._remove_db_circuit(circuito_id, holders)
+            changes['removed'] += 1
+
+        # Ambientes e áreas que saíram do banco (vazios, exceto os técnicos)
+        for old_key in index['ambientes'].values():
+            key = current_key(tuple(old_key))
+            node = self._rooms_by_key.get(key)
+            if key in current_rooms or node is None or node is tech_room or node.load_outputs:
+                continue
+            _remove_node(self._areas_by_name[key[0]].rooms, node)
+            del self._rooms_by_key[key]
+        for old_name in index['areas'].values():
+            name = renamed_areas.get(old_name, old_name)
+            node = self._areas_by_name.get(name)
+            if name in current_areas or node is None or node is tech_area or node.rooms:
+                continue
+            _remove_node(self.project_data["Areas"], node)
+            del self._areas_by_name[name]
+
+        index['areas'] = area_names
+        index['ambientes'] = {ambiente_id: list(key) for ambiente_id, key in room_keys.items()}
+        index['modulos'] = {modulo_id: list(value) for modulo_id, value in modules.items()}
 
-    def create_project(self, project_info):
-        """Cria um projeto base compatível com o ROEHN Wizard"""
-        project_guid = str(uuid.uuid4())
         now_iso = datetime.now().isoformat()
+        self.project_data["LastModified"] = now_iso
+        self.project_data["LastTimeSaved"] = now_iso
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Atualização incremental de %s: %d itens adicionados, %d removidos, %d atualizados em %.1fms",
+                projeto.nome, changes['added'], changes['removed'], changes['updated'],
+                (time.perf_counter() - started) * 1000,
+            )
+        return changes
+
+    def _find_item(self, record):
+        """Localiza o item de um circuito do índice; retorna (item, ambiente) ou (None, None)"""
+        return self._items_by_guid.get(record['guid'], (None, None))
+
+    def _remove_db_circuit(self, circuito_id, holders):
+        """Remove do projeto e do índice o item de um circuito, liberando seu canal"""
+        record = self._db_index['circuitos'].pop(circuito_id)
+        item, room = self._items_by_guid.pop(record['guid'], (None, None))
+        if item is not None:
+            _remove_node(room.load_outputs, item)
+        holder = holders.get(record['modulo'])
+        if holder is not None:
+            self._unlink_from_module(record['guid'], holder, record['canal'])
+
+    def _unlink_from_module(self, item_guid, module_name, canal):
+        """Esvazia o canal do módulo que ainda aponta para o item"""
+        for sub_items in self._module_slots.get(module_name, {}).values():
+            if 0 < canal <= len(sub_items) and sub_items[canal-1] == item_guid:
+                sub_items[canal-1] = EMPTY_GUID
+
+    def _rename_module(self, old_name, new_name):
+        """Renomeia um módulo mantendo GUID, endereços e vínculos"""
+        for module in self._modules_list():
+            if module.name == old_name:
+                module.name = new_name
+                break
+        self._module_slots[new_name] = self._module_slots.pop(old_name)
+
+    def _remove_module(self, name):
+        """Remove um módulo do quadro e libera sua posição no ACNET
+
+        Os endereços HSNET/DevID e os Unit IDs do módulo não são reaproveitados.
+        """
+        if self._module_slots.pop(name, None) is None:
+            return
+        modules_list = self._modules_list()
+        # O M4 (primeiro da lista) nunca é removido
+        for module in modules_list[1:]:
+            if module.name == name:
+                _remove_node(modules_list, module)
+                break
+        else:
+            return
+        acnet = self._acnet_slot
+        if module.guid in acnet:
+            position = acnet.index(module.guid)
+            acnet[position] = EMPTY_GUID
+            self._acnet_free = min(self._acnet_free, position)
+
+    def create_project(self, project_info):
+        """Cria um projeto base compatível com o ROEHN Wizard
+
+        Se project_info trouxer 'guid_seed', todos os GUIDs são derivados da
+        semente e do caminho de cada item (área/ambiente/circuito/módulo), e a
+        data do projeto vem de 'timestamp' (quem chama passa a data da última
+        alteração do projeto; sem ela, DETERMINISTIC_TIMESTAMP): o mesmo estado
+        do banco gera sempre o mesmo .rwp.
+        """
+        guid_seed = project_info.get('guid_seed')
+        self._guid_namespace = uuid.uuid5(GUID_NAMESPACE, str(guid_seed)) if guid_seed is not None else None
+        self._guid_paths = {}
+
+        project_guid = self._new_guid("Project")
+        if project_info.get('timestamp'):
+            now_iso = project_info['timestamp']
+        elif self._guid_namespace is not None:
+            now_iso = DETERMINISTIC_TIMESTAMP
+        else:
+            now_iso = datetime.now().isoformat()
         
         # No método create_project, substitua a definição do m4_module por:
 
         # Módulo base M4 (obrigatório) com UnitComposers
-        m4_module_guid = str(uuid.uuid4())
+        m4_module_guid = self._new_guid("LogicServer")
         m4_unit_composers = []
 
         # Lista de UnitComposers para o M4 baseada no exemplo do Roehn Wizard
@@ -109,8 +1071,10 @@ class RoehnProjectConverter:
             {"Name": "Temperatura", "PortNumber": 15, "PortType": 600, "IO": 0, "Kind": 1, "NotProgrammable": False},
         ]
 
-        # Iniciar IDs a partir de 39, conforme o exemplo
-        next_unit_id = 39
+        # Iniciar IDs a partir de 39, conforme o exemplo, e semear o alocador
+        # logo após os UnitComposers do M4
+        next_unit_id = FIRST_UNIT_ID
+        self._next_unit_id = FIRST_UNIT_ID + len(m4_composers_data)
 
         for composer in m4_composers_data:
             unit_composer = {
@@ -136,65 +1100,41 @@ class RoehnProjectConverter:
             m4_unit_composers.append(unit_composer)
             next_unit_id += 1
 
-        m4_module = {
+        m4_hsnet = int(project_info.get('m4_hsnet', 245))
+        m4_dev_id = int(project_info.get('m4_devid', 1))
+
+        m4_base = {
             "$type": "Module",
             "Name": "AQL-GV-M4",
             "DriverGuid": "80000000-0000-0000-0000-000000000016",
             "Guid": m4_module_guid,
             "IpAddress": project_info.get('m4_ip'),
-            "HsnetAddress": int(project_info.get('m4_hsnet', 245)),
+            "HsnetAddress": m4_hsnet,
             "PollTiming": 0,
             "Disabled": False,
             "RemotePort": 0,
             "RemoteIpAddress": None,
             "Notes": None,
             "Logicserver": True,
-            "DevID": int(project_info.get('m4_devid', 1)),
+            "DevID": m4_dev_id,
             "DevIDSlave": 0,
             "UnitComposers": m4_unit_composers,  # Adicionando os UnitComposers
-            "Slots": [
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 24,
-                    "SlotType": 0,
-                    "InitialPort": 1,
-                    "IO": 0,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"],
-                    "Name": "ACNET",
-                },
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 96,
-                    "SlotType": 8,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"] * 96,
-                    "Name": "Scene",
-                },
-            ],
+            "Slots": None,
             "SmartGroup": 1,
             "UserInterfaceGuid": "00000000-0000-0000-0000-000000000000",
             "PIRSensorReportEnable": False,
             "PIRSensorReportID": 0,
         }
-
-        # SpecialActions padrão
-        def default_special_actions():
-            return [
-                {"$type": "SpecialAction", "Name": "All HVAC",  "Guid": str(uuid.uuid4()), "Type": 4},
-                {"$type": "SpecialAction", "Name": "All Lights","Guid": str(uuid.uuid4()), "Type": 2},
-                {"$type": "SpecialAction", "Name": "All Shades","Guid": str(uuid.uuid4()), "Type": 3},
-                {"$type": "SpecialAction", "Name": "OFF",       "Guid": str(uuid.uuid4()), "Type": 0},
-                {"$type": "SpecialAction", "Name": "Volume",    "Guid": str(uuid.uuid4()), "Type": 1},
-            ]
+        m4_module = Module(m4_base, "AQL-GV-M4", m4_module_guid, m4_hsnet, m4_dev_id, [
+            Slot("ACNET", 24, 0, 0, [EMPTY_GUID]),
+            Slot("Scene", 96, 8, 1),
+        ])
 
         startup_var = {
             "$type": "Variable",
             "Name": "Startup",
             "Description": "This variable indicates that the system has just been booted.",
-            "Guid": str(uuid.uuid4()),
+            "Guid": self._new_guid("Variable", "Startup"),
             "Configurable": False,
             "Memorizable": False,
             "IsStartup": True,
@@ -205,49 +1145,31 @@ class RoehnProjectConverter:
             "Id": 1,
         }
 
-        # Montagem do projeto
-        self.project_data = {
-            "$type": "Project",
-            "Areas": [
+        # Área e sala técnicas, com o quadro que contém o M4
+        tech_area_name = project_info.get('tech_area', 'Área Técnica')
+        tech_area = new_area(tech_area_name, self._new_guid)
+        tech_area.rooms.append(new_room(
+            tech_area_name,
+            project_info.get('tech_room', 'Sala Técnica'),
+            [
                 {
-                    "$type": "Area",
-                    "Scenes": [],
-                    "Scripts": [],
-                    "Variables": [],
-                    "SpecialActions": default_special_actions(),
-                    "Guid": str(uuid.uuid4()),
-                    "Name": project_info.get('tech_area', 'Área Técnica'),
-                    "Notes": "",
-                    "NotDisplayOnROEHNApp": False,
-                    "SubItems": [
-                        {
-                            "$type": "Room",
-                            "NotDisplayOnROEHNApp": False,
-                            "Name": project_info.get('tech_room', 'Sala Técnica'),
-                            "Notes": None,
-                            "Scenes": [],
-                            "Scripts": [],
-                            "Variables": [],
-                            "LoadOutputs": [],
-                            "UserInterfaces": [],
-                            "AutomationBoards": [
-                                {
-                                    "$type": "AutomationBoard",
-                                    "Name": project_info.get('board_name', 'Quadro Elétrico'),
-                                    "Notes": None,
-                                    "ModulesList": [m4_module],
-                                }
-                            ],
-                            "SpecialActions": default_special_actions(),
-                            "Guid": str(uuid.uuid4()),
-                        }
-                    ],
+                    "$type": "AutomationBoard",
+                    "Name": project_info.get('board_name', 'Quadro Elétrico'),
+                    "Notes": None,
+                    "ModulesList": [m4_module],
                 }
             ],
+            self._new_guid,
+        ))
+
+        # Montagem do projeto
+        self.project_data = {
+            "$type": "Project",
+            "Areas": [tech_area],
             "Scenes": [],
             "Scripts": [],
             "Variables": [startup_var],
-            "SpecialActions": default_special_actions(),
+            "SpecialActions": new_special_actions(self._new_guid, "Project"),
             "SavedProfiles": None,
             "SavedControlModels": None,
             "ClientInfo": {
@@ -267,7 +1189,7 @@ class RoehnProjectConverter:
                 "$type": "ProgrammerInfo",
                 "Name": project_info.get('programmer_name', 'Programador'),
                 "Email": project_info.get('programmer_email', ''),
-                "Guid": project_info.get('programmer_guid', str(uuid.uuid4())),
+                "Guid": project_info.get('programmer_guid') or self._new_guid("Programmer"),
             },
             "CloudConfig": {
                 "$type": "CloudConfig",
@@ -286,21 +1208,70 @@ class RoehnProjectConverter:
             "Notes": None,
             "RoehnAppExport": False,
         }
+
+        self._index_areas_and_rooms()
+        self._stats = {'loads': 0, 'shades': 0, 'hvac': 0, 'skipped': 0}
+
+        # O endereço do M4 fica reservado antes de qualquer módulo novo
+        self._hsnet_allocator = AddressAllocator(MIN_HSNET_ADDRESS)
+        self._hsnet_allocator.mark_used(m4_hsnet)
+        self._dev_id_allocator = AddressAllocator()
+        self._dev_id_allocator.mark_used(m4_dev_id)
+
+        self._module_slots = {}
+        self._index_module(m4_module)
+        self._acnet_slot = m4_module.slots[0].sub_items
+        self._acnet_free = self._acnet_slot.index(EMPTY_GUID)
         
         return self.project_data
 
     def process_csv(self, csv_content):
         """Processa o conteúdo CSV e adiciona os circuitos ao projeto"""
+        self.process_csv_stream(io.StringIO(csv_content))
+        return self.project_data
+
+    def process_csv_stream(self, fileobj, batch_size=CSV_BATCH_SIZE):
+        """Processa um CSV lido de um arquivo (texto ou binário UTF-8) em lotes de linhas
+
+        Em cada lote as linhas são agrupadas por módulo, que é criado e
+        localizado uma única vez por grupo; dentro de um ambiente, os itens
+        ficam na ordem dos grupos. Retorna um relatório com o total de linhas,
+        as aceitas e as rejeitadas ({'linha', 'circuito', 'motivo'}).
+        """
         if not self.project_data:
             raise ValueError("Projeto não inicializado. Chame create_project primeiro.")
-        
-        # Converter conteúdo CSV para lista de dicionários
-        csv_file = io.StringIO(csv_content)
-        reader = csv.DictReader(csv_file)
-        
+
+        started = time.perf_counter()
+        if not isinstance(fileobj, io.TextIOBase):
+            fileobj = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+        reader = csv.DictReader(fileobj)
+        report = {'linhas': 0, 'aceitas': 0, 'rejeitadas': []}
         shades_seen = set()
-        
-        for row in reader:
+
+        while True:
+            batch = []
+            for row in reader:
+                batch.append((reader.line_num, row))
+                if len(batch) >= batch_size:
+                    break
+            if not batch:
+                break
+            report['linhas'] += len(batch)
+            self._process_csv_batch(batch, report, shades_seen)
+
+        # Os grupos por módulo desordenam as rejeições dentro de cada lote
+        report['rejeitadas'].sort(key=lambda rejeicao: rejeicao['linha'])
+        self._stats['skipped'] += len(report['rejeitadas'])
+        self._log_summary("CSV", {'csv': time.perf_counter() - started})
+        if report['rejeitadas'] and logger.isEnabledFor(logging.INFO):
+            logger.info("CSV: %d de %d linhas rejeitadas", len(report['rejeitadas']), report['linhas'])
+        return report
+
+    def _process_csv_batch(self, batch, report, shades_seen):
+        """Valida um lote de linhas do CSV e adiciona os circuitos agrupados por módulo"""
+        rejected = report['rejeitadas']
+        groups = {}
+        for line_num, row in batch:
             circuito = (row.get("Circuito") or "").strip()
             tipo = (row.get("Tipo") or "").strip().lower()
             nome = (row.get("Nome") or "").strip()
@@ -310,664 +1281,550 @@ class RoehnProjectConverter:
             modulo = (row.get("Modulo") or "").strip()
             id_modulo = (row.get("id Modulo") or row.get("id_modulo") or "").strip()
 
-            if not area or not ambiente or not modulo or not id_modulo or not canal:
+            missing = [
+                campo for campo, valor in (
+                    ("Area", area), ("Ambiente", ambiente), ("Modulo", modulo),
+                    ("id Modulo", id_modulo), ("Canal", canal),
+                ) if not valor
+            ]
+            if missing:
+                rejected.append({'linha': line_num, 'circuito': circuito,
+                                 'motivo': f"campos obrigatórios vazios: {', '.join(missing)}"})
                 continue
-                
             try:
                 canal = int(canal)
             except ValueError:
+                rejected.append({'linha': line_num, 'circuito': circuito, 'motivo': f"canal inválido: {canal}"})
+                continue
+            if tipo not in LINK_SLOTS:
+                rejected.append({'linha': line_num, 'circuito': circuito, 'motivo': f"tipo desconhecido: {tipo}"})
                 continue
 
-            self._ensure_area_exists(area)
-            self._ensure_room_exists(area, ambiente)
             # Para CSV, ainda usamos o formato antigo para compatibilidade
-            modulo_nome = self._ensure_module_exists(modulo, f"{modulo}_{id_modulo}")
-
-            if tipo == "luz":
-                guid = self._add_load(area, ambiente, nome or circuito or "Load")
-                self._link_load_to_module(guid, modulo_nome, canal)
-            elif tipo == "persiana":
-                key = f"{area}|{ambiente}|{nome or circuito or 'Persiana'}"
-                if key not in shades_seen:
-                    guid = self._add_shade(area, ambiente, nome or circuito or "Persiana")
-                    self._link_shade_to_module(guid, modulo_nome, canal)
-                    shades_seen.add(key)
-            elif tipo == "hvac":
-                guid = self._add_hvac(area, ambiente, nome or "Ar-Condicionado")
-                self._link_hvac_to_module(guid, modulo_nome, canal)
-        
-        return self.project_data
+            key = (modulo, f"{modulo}_{id_modulo}")
+            groups.setdefault(key, []).append((line_num, circuito, tipo, nome, area, ambiente, canal))
+
+        # Módulo, slot e canal são validados antes de criar qualquer nó, para que
+        # linhas rejeitadas não deixem áreas, ambientes ou módulos vazios
+        accepted = {}
+        for (modulo, modulo_nome), rows in groups.items():
+            slots = self._module_slots.get(modulo_nome)
+            if slots is not None:
+                capacities = {name: len(sub_items) for name, sub_items in slots.items()}
+            else:
+                template = self._module_template(modulo)
+                if template is None:
+                    rejected.extend(
+                        {'linha': row[0], 'circuito': row[1], 'motivo': f"modelo de módulo desconhecido: {modulo}"}
+                        for row in rows
+                    )
+                    continue
+                capacities = {}
+                for name, capacity, _, _ in MODULE_TEMPLATES[template].slot_layout:
+                    capacities.setdefault(name, capacity)
+            capacity_by_tipo = {
+                tipo: next((capacities[name] for name in slot_names if name in capacities), None)
+                for tipo, slot_names in LINK_SLOTS.items()
+            }
+
+            valid = []
+            for row in rows:
+                line_num, circuito, tipo, _, _, _, canal = row
+                capacity = capacity_by_tipo[tipo]
+                if capacity is None:
+                    rejected.append({'linha': line_num, 'circuito': circuito,
+                                     'motivo': f"módulo {modulo_nome} não aceita circuitos do tipo {tipo}"})
+                    continue
+                if not 1 <= canal <= capacity:
+                    rejected.append({'linha': line_num, 'circuito': circuito,
+                                     'motivo': f"canal {canal} fora da faixa do módulo {modulo_nome} (1-{capacity})"})
+                    continue
+                valid.append(row)
+            if valid:
+                accepted[(modulo, modulo_nome)] = valid
+
+        # Áreas e ambientes são criados na ordem do arquivo, antes do agrupamento
+        for row in sorted((row for rows in accepted.values() for row in rows), key=lambda row: row[0]):
+            self._ensure_room_exists(row[4], row[5])
+
+        for (modulo, modulo_nome), rows in accepted.items():
+            self._ensure_module_exists(modulo, modulo_nome)
+            slots = self._module_slots[modulo_nome]
+            slots_by_tipo = {
+                tipo: next((slots[name] for name in slot_names if name in slots), None)
+                for tipo, slot_names in LINK_SLOTS.items()
+            }
+
+            for _, circuito, tipo, nome, area, ambiente, canal in rows:
+                sub_items = slots_by_tipo[tipo]
+                if tipo == "luz":
+                    guid = self._add_load(area, ambiente, nome or circuito or "Load", key=circuito or None)
+                elif tipo == "persiana":
+                    # Persianas aparecem em mais de uma linha; só a primeira cria o item
+                    shade_key = (area, ambiente, nome or circuito or "Persiana")
+                    if shade_key in shades_seen:
+                        report['aceitas'] += 1
+                        continue
+                    shades_seen.add(shade_key)
+                    guid = self._add_shade(area, ambiente, nome or circuito or "Persiana", key=circuito or None)
+                else:
+                    guid = self._add_hvac(area, ambiente, nome or "Ar-Condicionado", key=circuito or None)
+                sub_items[canal-1] = guid
+                report['aceitas'] += 1
+
+    def parse_rwp(self, fileobj):
+        """Lê um .rwp (JSON indentado, compacto ou gzip) e extrai as linhas do banco
+
+        Retorna {'nome', 'areas', 'modulos'}: cada área traz seus ambientes e
+        cada ambiente seus circuitos, já com 'modulo' (nome) e 'canal' quando o
+        item aparece em um slot de módulo. O arquivo é só lido: project_data não muda.
+        O JSON é lido em blocos (json_backend.iter_object), descendo até cada
+        circuito e módulo, e dos módulos só são guardados os campos usados na
+        vinculação; assim a memória usada não cresce com o tamanho do arquivo.
+        """
+        started = time.perf_counter()
+        if fileobj.read(2) == b"\x1f\x8b":
+            fileobj.seek(0)
+            fileobj = gzip.GzipFile(fileobj=fileobj, mode="rb")
+        else:
+            fileobj.seek(0)
+
+        skipped = 0
+        # Índice único GUID -> circuito, consultado pelas posições dos slots
+        circuits_by_guid = {}
+        areas = {}
+        # (DriverGuid, Name, Logicserver, [(nome do slot, SubItemsGuid)]) de cada módulo
+        module_nodes = []
+        project_name = None
+        first_area_name = None
+        # O Roehn Wizard pode gravar o arquivo com BOM; iter_object o ignora
+        for key, value in json_backend.iter_object(fileobj, arrays=RWP_STREAM_ARRAYS):
+            if key == "Name":
+                project_name = value
+            elif key == "Areas":
+                for area in value or []:
+                    area_name, rooms, area_skipped = self._parse_rwp_area(area, circuits_by_guid, module_nodes)
+                    skipped += area_skipped
+                    if first_area_name is None:
+                        first_area_name = area_name
+                    ambientes = areas.setdefault(area_name, {'nome': area_name, 'ambientes': {}})['ambientes']
+                    for room_name, circuitos, logic_server in rooms:
+                        # A sala técnica gerada junto com o M4 não é um ambiente do projeto
+                        if circuitos or not logic_server:
+                            ambiente = ambientes.setdefault(room_name, {'nome': room_name, 'circuitos': []})
+                            ambiente['circuitos'].extend(circuitos)
+        phases = {'leitura': time.perf_counter() - started}
+
+        started = time.perf_counter()
+        models_by_driver = {info['driver_guid']: model for model, info in self.modules_info.items()}
+        modulos = []
+        module_names = set()
+        for driver_guid, module_name, logic_server, slots in module_nodes:
+            model = models_by_driver.get(driver_guid)
+            if model is None:
+                if not logic_server:
+                    skipped += 1
+                continue
+            nome = _unique_name(module_name, module_names)
+            info = self.modules_info[model]
+            modulos.append({
+                'nome': nome,
+                'tipo': DB_MODULE_TYPES[model],
+                'quantidade_canais': max(info['slots'].values()),
+            })
+            for slot_name, guids in slots:
+                if slot_name not in info['slots']:
+                    continue
+                for position, guid in enumerate(guids):
+                    circuito = circuits_by_guid.get(guid)
+                    if circuito is not None and circuito['modulo'] is None:
+                        circuito['modulo'] = nome
+                        circuito['canal'] = position + 1
+        phases['modulos'] = time.perf_counter() - started
+
+        # Identificadores únicos por ambiente, derivados do nome do item
+        result_areas = []
+        for area in areas.values():
+            if not area['ambientes'] and area['nome'] == first_area_name:
+                continue
+            result_ambientes = []
+            for ambiente in area['ambientes'].values():
+                identificadores = set()
+                for circuito in ambiente['circuitos']:
+                    circuito['identificador'] = _unique_name(circuito['nome'], identificadores)
+                result_ambientes.append(ambiente)
+            result_areas.append({'nome': area['nome'], 'ambientes': result_ambientes})
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Leitura de .rwp %s: %d áreas, %d circuitos, %d módulos, %d itens ignorados; tempos: %s",
+                project_name,
+                len(result_areas),
+                len(circuits_by_guid),
+                len(modulos),
+                skipped,
+                ", ".join(f"{phase}={elapsed * 1000:.1f}ms" for phase, elapsed in phases.items()),
+            )
+        return {'nome': project_name, 'areas': result_areas, 'modulos': modulos}
+
+    def _parse_rwp_area(self, area, circuits_by_guid, module_nodes):
+        """Lê os pares de uma área do .rwp; retorna (nome, [(ambiente, circuitos, é a sala do M4)], itens ignorados)
+
+        Os nomes podem vir depois das listas no JSON, então a área e os
+        ambientes só são montados depois de lidos por inteiro.
+        """
+        name = None
+        rooms = []
+        skipped = 0
+        for key, value in area:
+            if key == "Name":
+                name = value
+            elif key == "SubItems":
+                for room in value or []:
+                    room_name, circuitos, logic_server, room_skipped = self._parse_rwp_room(
+                        room, circuits_by_guid, module_nodes)
+                    rooms.append((room_name, circuitos, logic_server))
+                    skipped += room_skipped
+        return name, rooms, skipped
+
+    def _parse_rwp_room(self, room, circuits_by_guid, module_nodes):
+        """Lê os pares de um ambiente do .rwp; retorna (nome, circuitos, tem o M4, itens ignorados)"""
+        name = None
+        circuitos = []
+        logic_server = False
+        skipped = 0
+        for key, value in room:
+            if key == "Name":
+                name = value
+            elif key == "LoadOutputs":
+                for item in value or []:
+                    tipo = RWP_CIRCUIT_TYPES.get(item.get("$type"))
+                    if tipo is None:
+                        skipped += 1
+                        continue
+                    circuito = {'nome': item.get("Name") or tipo, 'tipo': tipo, 'modulo': None, 'canal': None}
+                    circuitos.append(circuito)
+                    circuits_by_guid[item["Guid"]] = circuito
+            elif key == "AutomationBoards":
+                for board in value or []:
+                    for board_key, modules in board:
+                        if board_key != "ModulesList":
+                            continue
+                        for module in modules or []:
+                            logic_server = logic_server or module.get("Logicserver", False)
+                            module_nodes.append((
+                                module.get("DriverGuid"),
+                                module["Name"],
+                                module.get("Logicserver", False),
+                                [(slot["Name"], slot.get("SubItemsGuid") or []) for slot in module.get("Slots") or []],
+                            ))
+        return name, circuitos, logic_server, skipped
+
+    def _log_summary(self, source, phases):
+        """Registra um resumo (INFO) da conversão com contagens e tempos por fase"""
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(
+            "Conversão de %s: %d áreas, %d ambientes, %d módulos, %d cargas, %d persianas, "
+            "%d HVAC, %d circuitos ignorados; tempos: %s",
+            source,
+            len(self._areas_by_name),
+            len(self._rooms_by_key),
+            len(self._module_slots),
+            self._stats['loads'],
+            self._stats['shades'],
+            self._stats['hvac'],
+            self._stats['skipped'],
+            ", ".join(f"{phase}={elapsed * 1000:.1f}ms" for phase, elapsed in phases.items()),
+        )
+
+    def _new_guid(self, *path):
+        """Gera o GUID de um item: aleatório ou derivado da semente e do caminho"""
+        if self._guid_namespace is None:
+            return str(uuid.uuid4())
+        name = "\x1f".join(str(part) for part in path)
+        # Caminhos repetidos (ex.: circuitos com o mesmo nome no CSV) recebem
+        # um sufixo com a ordem de ocorrência
+        occurrence = self._guid_paths.get(name, 0)
+        self._guid_paths[name] = occurrence + 1
+        if occurrence:
+            name = f"{name}\x1f{occurrence}"
+        return str(uuid.uuid5(self._guid_namespace, name))
+
+    def _index_areas_and_rooms(self):
+        """Reconstrói os índices de áreas e ambientes a partir de project_data"""
+        self._areas_by_name = {}
+        self._rooms_by_key = {}
+        for area in self.project_data["Areas"]:
+            self._areas_by_name.setdefault(area.name, area)
+            for room in area.rooms:
+                self._rooms_by_key.setdefault((area.name, room.name), room)
+
+    def _get_room(self, area_name, room_name):
+        """Retorna o ambiente já existente de uma área"""
+        try:
+            return self._rooms_by_key[(area_name, room_name)]
+        except KeyError:
+            raise ValueError(f"Ambiente '{room_name}' não encontrado na área '{area_name}'")
 
     def _ensure_area_exists(self, area_name):
         """Garante que uma área existe no projeto Roehn"""
-        for area in self.project_data["Areas"]:
-            if area["Name"] == area_name:
-                return area
+        area = self._areas_by_name.get(area_name)
+        if area is not None:
+            return area
         
         # Se a área não existe, cria uma nova
-        new_area = {
-            "$type": "Area",
-            "Scenes": [],
-            "Scripts": [],
-            "Variables": [],
-            "SpecialActions": [
-                {"$type": "SpecialAction", "Name": "All HVAC", "Guid": str(uuid.uuid4()), "Type": 4},
-                {"$type": "SpecialAction", "Name": "All Lights", "Guid": str(uuid.uuid4()), "Type": 2},
-                {"$type": "SpecialAction", "Name": "All Shades", "Guid": str(uuid.uuid4()), "Type": 3},
-                {"$type": "SpecialAction", "Name": "OFF", "Guid": str(uuid.uuid4()), "Type": 0},
-                {"$type": "SpecialAction", "Name": "Volume", "Guid": str(uuid.uuid4()), "Type": 1}
-            ],
-            "Guid": str(uuid.uuid4()),
-            "Name": area_name,
-            "Notes": "",
-            "NotDisplayOnROEHNApp": False,
-            "SubItems": []
-        }
-        self.project_data["Areas"].append(new_area)
-        return new_area
+        area = new_area(area_name, self._new_guid)
+        self.project_data["Areas"].append(area)
+        self._areas_by_name[area_name] = area
+        return area
 
     def _ensure_room_exists(self, area_name, room_name):
         """Garante que um ambiente existe em uma área"""
         area = self._ensure_area_exists(area_name)
         
-        for room in area["SubItems"]:
-            if room["Name"] == room_name:
-                return room
+        room = self._rooms_by_key.get((area_name, room_name))
+        if room is not None:
+            return room
         
         # Se o ambiente não existe, cria um novo
-        new_room = {
-            "$type": "Room",
-            "NotDisplayOnROEHNApp": False,
-            "Name": room_name,
-            "Notes": None,
-            "Scenes": [],
-            "Scripts": [],
-            "Variables": [],
-            "LoadOutputs": [],
-            "UserInterfaces": [],
-            "AutomationBoards": [],
-            "SpecialActions": [
-                {"$type": "SpecialAction", "Name": "All HVAC", "Guid": str(uuid.uuid4()), "Type": 4},
-                {"$type": "SpecialAction", "Name": "All Lights", "Guid": str(uuid.uuid4()), "Type": 2},
-                {"$type": "SpecialAction", "Name": "All Shades", "Guid": str(uuid.uuid4()), "Type": 3},
-                {"$type": "SpecialAction", "Name": "OFF", "Guid": str(uuid.uuid4()), "Type": 0},
-                {"$type": "SpecialAction", "Name": "Volume", "Guid": str(uuid.uuid4()), "Type": 1}
-            ],
-            "Guid": str(uuid.uuid4())
-        }
-        area["SubItems"].append(new_room)
-        return new_room
+        room = new_room(area_name, room_name, new_guid=self._new_guid)
+        area.rooms.append(room)
+        self._rooms_by_key[(area_name, room_name)] = room
+        return room
 
     def _ensure_module_exists(self, model, module_name):
         """Garantir que um módulo existe no projeto usando o nome real"""
-        modules_list = self.project_data["Areas"][0]["SubItems"][0]["AutomationBoards"][0]["ModulesList"]
-        
         # Verificar se o módulo já existe pelo nome
-        for module in modules_list:
-            if module["Name"] == module_name:
-                return module_name
-                
-        # Criar novo módulo se não existir
-        hsnet = self._find_max_hsnet() + 1
-        while self._is_hsnet_duplicate(hsnet):
-            hsnet += 1
-            
-        dev_id = self._find_max_dev_id() + 1
-        
-        # Determinar o tipo de módulo e criar
-        u = model.upper()
-        if "RL12" in u:
-            self._create_rl12_module(module_name, hsnet, dev_id)
-        elif "RL4" in u:
-            self._create_rl4_module(module_name, hsnet, dev_id)
-        elif "LX4" in u:
-            self._create_lx4_module(module_name, hsnet, dev_id)
-        elif "SA1" in u:
-            self._create_sa1_module(module_name, hsnet, dev_id)
-        elif "DIM8" in u or "ADP-DIM8" in u:
-            self._create_dim8_module(module_name, hsnet, dev_id)
-            
-        return module_name
-
-    def _create_rl4_module(self, name, hsnet_address, dev_id):
-        """Cria um módulo RL4"""
-        new_module_guid = str(uuid.uuid4())
-        new_module = {
-            "$type": "Module",
-            "Name": name,
-            "DriverGuid": "80000000-0000-0000-0000-000000000010",
-            "Guid": new_module_guid,
-            "IpAddress": "",
-            "HsnetAddress": hsnet_address,
-            "PollTiming": 0,
-            "Disabled": False,
-            "RemotePort": 0,
-            "RemoteIpAddress": "",
-            "Notes": None,
-            "Logicserver": False,
-            "DevID": dev_id,
-            "DevIDSlave": 0,
-            "UnitComposers": None,
-            "Slots": [
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 4,
-                    "SlotType": 1,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"] * 4,
-                    "Name": "Load ON/OFF"
-                }
-            ],
-            "SmartGroup": 1,
-            "UserInterfaceGuid": "00000000-0000-0000-0000-000000000000",
-            "PIRSensorReportEnable": False,
-            "PIRSensorReportID": 0
-        }
-        self._add_module_to_project(new_module, new_module_guid)
-
-    def _create_lx4_module(self, name, hsnet_address, dev_id):
-        """Cria um módulo LX4"""
-        next_unit_id = self._find_max_unit_id() + 1
-        unit_composers = []
-        for i in range(4):
-            for j in range(4):
-                unit_composers.append({
-                    "$type": "UnitComposer",
-                    "Name": f"Opening Percentage {i+1} {j+1}",
-                    "Unit": {
-                        "$type": "Unit",
-                        "Id": next_unit_id,
-                        "Event": 0,
-                        "Scene": 0,
-                        "Disabled": False,
-                        "Logged": False,
-                        "Memo": False,
-                        "Increment": False
-                    },
-                    "PortNumber": 1 if j % 2 == 0 else 5,
-                    "PortType": 6,
-                    "NotProgrammable": False,
-                    "Kind": 1,
-                    "IO": 1 if j % 2 == 0 else 0,
-                    "Value": 0
-                })
-                next_unit_id += 1
-
-        new_module_guid = str(uuid.uuid4())
-        new_module = {
-            "$type": "Module",
-            "Name": name,
-            "DriverGuid": "80000000-0000-0000-0000-000000000003",
-            "Guid": new_module_guid,
-            "IpAddress": "",
-            "HsnetAddress": hsnet_address,
-            "PollTiming": 0,
-            "Disabled": False,
-            "RemotePort": 0,
-            "RemoteIpAddress": "",
-            "Notes": None,
-            "Logicserver": False,
-            "DevID": dev_id,
-            "DevIDSlave": 0,
-            "UnitComposers": unit_composers,
-            "Slots": [
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 4,
-                    "SlotType": 7,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"] * 4,
-                    "Name": "Shade"
-                },
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 6,
-                    "SlotType": 6,
-                    "InitialPort": 1,
-                    "IO": 0,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"] * 6,
-                    "Name": "PNET"
-                }
-            ],
-            "SmartGroup": 1,
-            "UserInterfaceGuid": "00000000-0000-0000-0000-000000000000",
-            "PIRSensorReportEnable": False,
-            "PIRSensorReportID": 0
-        }
-        self._add_module_to_project(new_module, new_module_guid)
+        if module_name in self._module_slots:
+            return module_name
 
-    def _create_sa1_module(self, name, hsnet_address, dev_id):
-        """Cria um módulo SA1"""
-        next_unit_id = self._find_max_unit_id() + 1
-        unit_composers = []
-        composers_data = [
-            {"Name": "Power", "PortNumber": 1, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
-            {"Name": "Mode", "PortNumber": 2, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
-            {"Name": "Fan Speed", "PortNumber": 4, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
-            {"Name": "Swing", "PortNumber": 5, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
-            {"Name": "Temp Up", "PortNumber": 11, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
-            {"Name": "Temp Down", "PortNumber": 12, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
-            {"Name": "Display/Light", "PortNumber": 3, "PortType": 100, "NotProgrammable": False, "Kind": 0, "IO": 1},
-        ]
-        for composer in composers_data:
-            unit_composers.append({
-                "$type": "UnitComposer",
-                "Name": composer["Name"],
-                "Unit": {
-                    "$type": "Unit",
-                    "Id": next_unit_id,
-                    "Event": 0,
-                    "Scene": 0,
-                    "Disabled": False,
-                    "Logged": False,
-                    "Memo": False,
-                    "Increment": False
-                },
-                "PortNumber": composer["PortNumber"],
-                "PortType": composer["PortType"],
-                "NotProgrammable": composer["NotProgrammable"],
-                "Kind": composer["Kind"],
-                "IO": composer["IO"],
-                "Value": 0
-            })
-            next_unit_id += 1
+        # Determinar o tipo de módulo antes de reservar endereços: um modelo
+        # desconhecido não é criado e não pode deixar buracos no HSNET/DevID
+        template = self._module_template(model)
+        if template is None:
+            return module_name
 
-        new_module_guid = str(uuid.uuid4())
-        new_module = {
-            "$type": "ModuleHVAC",
-            "SubItemComposers": [unit_composers],
-            "GTWItemComposers": [],
-            "Name": name,
-            "DriverGuid": "80000000-0000-0000-0000-000000000013",
-            "Guid": new_module_guid,
-            "IpAddress": "",
-            "HsnetAddress": hsnet_address,
-            "PollTiming": 0,
-            "Disabled": False,
-            "RemotePort": 0,
-            "RemoteIpAddress": "",
-            "Notes": None,
-            "Logicserver": False,
-            "DevID": dev_id,
-            "DevIDSlave": 0,
-            "Slots": [
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 1,
-                    "SlotType": 4,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"],
-                    "Name": "IR"
-                }
-            ],
-            "SmartGroup": 1,
-            "UserInterfaceGuid": "00000000-0000-0000-0000-000000000000",
-            "PIRSensorReportEnable": False,
-            "PIRSensorReportID": 0
-        }
-
-        self._add_module_to_project(new_module, new_module_guid)
-
-    def _create_dim8_module(self, name, hsnet_address, dev_id):
-        """Cria um módulo DIM8"""
-        new_module_guid = str(uuid.uuid4())
-        zero = "00000000-0000-0000-0000-000000000000"
+        # Criar novo módulo se não existir
+        hsnet = self._hsnet_allocator.allocate()
+        dev_id = self._dev_id_allocator.allocate()
+        self._create_module(template, module_name, hsnet, dev_id)
+        return module_name
 
-        new_module = {
-            "$type": "Module",
-            "Name": name,
-            "DriverGuid": "80000000-0000-0000-0000-000000000001",
-            "Guid": new_module_guid,
-            "IpAddress": "",
-            "HsnetAddress": hsnet_address,
-            "PollTiming": 0,
-            "Disabled": False,
-            "RemotePort": 0,
-            "RemoteIpAddress": "",
-            "Notes": None,
-            "Logicserver": False,
-            "DevID": dev_id,
-            "DevIDSlave": 0,
-            "UnitComposers": None,
-            "Slots": [
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 8,
-                    "SlotType": 2,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": [zero] * 8,
-                    "Name": "Load Dim"
-                },
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 6,
-                    "SlotType": 6,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": [zero] * 6,
-                    "Name": "PNET"
-                }
-            ],
-            "SmartGroup": 1,
-            "UserInterfaceGuid": "00000000-0000-0000-0000-000000000000",
-            "PIRSensorReportEnable": False,
-            "PIRSensorReportID": 0
-        }
+    @staticmethod
+    def _module_template(model):
+        """Template (chave de MODULE_TEMPLATES) do modelo informado no banco ou no CSV, ou None"""
+        u = model.upper()
+        if "RL12" in u:
+            return 'ADP-RL12'
+        if "RL4" in u:
+            return 'RL4'
+        if "LX4" in u:
+            return 'LX4'
+        if "SA1" in u:
+            return 'SA1'
+        if "DIM8" in u or "ADP-DIM8" in u:
+            return 'DIM8'
+        return None
 
+    def _create_module(self, model, name, hsnet_address, dev_id):
+        """Cria um módulo a partir do template do driver (RL12, RL4, LX4, SA1, DIM8)"""
+        template = MODULE_TEMPLATES[model]
+        first_unit_id = self._allocate_unit_ids(template.unit_count) if template.unit_count else None
+        new_module_guid = self._new_guid("Module", name)
+        new_module = template.stamp(name, new_module_guid, hsnet_address, dev_id, first_unit_id)
         self._add_module_to_project(new_module, new_module_guid)
 
-    def _create_rl12_module(self, name, hsnet_address, dev_id):
-        """Cria um módulo RL12"""
-        new_module_guid = str(uuid.uuid4())
-        new_module = {
-            "$type": "Module",
-            "Name": name,
-            "DriverGuid": "80000000-0000-0000-0000-000000000006",
-            "Guid": new_module_guid,
-            "IpAddress": "",
-            "HsnetAddress": hsnet_address,
-            "PollTiming": 0,
-            "Disabled": False,
-            "RemotePort": 0,
-            "RemoteIpAddress": "",
-            "Notes": None,
-            "Logicserver": False,
-            "DevID": dev_id,
-            "DevIDSlave": 0,
-            "UnitComposers": None,
-            "Slots": [
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 12,
-                    "SlotType": 1,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"] * 12,
-                    "Name": "Load ON/OFF"
-                },
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 6,
-                    "SlotType": 6,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"] * 6,
-                    "Name": "PNET"
-                }
-            ],
-            "SmartGroup": 1,
-            "UserInterfaceGuid": "00000000-0000-0000-0000-000000000000",
-            "PIRSensorReportEnable": False,
-            "PIRSensorReportID": 0
-        }
-        self._add_module_to_project(new_module, new_module_guid)
-
-    # Implementar métodos similares para outros tipos de módulos:
-    # _create_rl4_module, _create_lx4_module, _create_sa1_module, _create_dim8_module
-
     def _add_module_to_project(self, new_module, new_module_guid):
         """Adiciona um módulo ao projeto e atualiza o ACNET"""
-        modules_list = self.project_data["Areas"][0]["SubItems"][0]["AutomationBoards"][0]["ModulesList"]
-        modules_list.append(new_module)
-
-        # Atualizar o ACNET do módulo M4
-        if modules_list:
-            first_module = modules_list[0]  # O M4 é o primeiro módulo
-            for slot in first_module.get("Slots", []):
-                if slot.get("Name") == "ACNET":
-                    # Encontrar a primeira posição vazia e substituir pelo novo GUID
-                    for i, guid in enumerate(slot["SubItemsGuid"]):
-                        if guid == "00000000-0000-0000-0000-000000000000":
-                            slot["SubItemsGuid"][i] = new_module_guid
-                            break
-                    else:
-                        # Se não encontrou posição vazia, adiciona ao final
-                        slot["SubItemsGuid"].append(new_module_guid)
-                    
-                    # Garantir que há pelo menos um item vazio no final
-                    if slot["SubItemsGuid"][-1] != "00000000-0000-0000-0000-000000000000":
-                        slot["SubItemsGuid"].append("00000000-0000-0000-0000-000000000000")
-                    
-                    break
+        self._modules_list().append(new_module)
+        self._index_module(new_module)
 
-    def _find_max_dev_id(self):
-        """Encontra o maior DevID atual"""
-        max_id = 0
-        if not self.project_data:
-            return max_id
-            
-        try:
-            modules = self.project_data['Areas'][0]['SubItems'][0]['AutomationBoards'][0]['ModulesList']
-            for module in modules:
-                if 'DevID' in module and module['DevID'] > max_id:
-                    max_id = module['DevID']
-        except (KeyError, IndexError):
-            pass
-            
-        return max_id
+        # Ocupar a primeira posição vazia do ACNET do M4 (ou adicionar ao final)
+        acnet = self._acnet_slot
+        if self._acnet_free < len(acnet):
+            acnet[self._acnet_free] = new_module_guid
+        else:
+            acnet.append(new_module_guid)
+        self._acnet_free += 1
+        while self._acnet_free < len(acnet) and acnet[self._acnet_free] != EMPTY_GUID:
+            self._acnet_free += 1
 
-    def _find_max_hsnet(self):
-        """Encontra o maior HSNET atual"""
-        max_addr = 100
-        if not self.project_data:
-            return max_addr
-            
-        try:
-            modules = self.project_data['Areas'][0]['SubItems'][0]['AutomationBoards'][0]['ModulesList']
-            for module in modules:
-                if 'HsnetAddress' in module and module['HsnetAddress'] > max_addr:
-                    max_addr = module['HsnetAddress']
-        except (KeyError, IndexError):
-            pass
-            
-        return max_addr
+        # Garantir que há pelo menos um item vazio no final
+        if acnet[-1] != EMPTY_GUID:
+            acnet.append(EMPTY_GUID)
 
-    def _is_hsnet_duplicate(self, hsnet_address):
-        """Verifica se um endereço HSNET já está em uso"""
-        if not self.project_data:
+    def _modules_list(self):
+        """Lista de módulos do quadro da sala técnica, onde ficam o M4 e os módulos criados"""
+        return self.project_data["Areas"][0].rooms[0].automation_boards[0]["ModulesList"]
+
+    def _index_module(self, module):
+        """Indexa os slots de um módulo pelo nome, já preenchidos até a capacidade"""
+        slots = {}
+        for slot in module.slots:
+            if slot.name != "ACNET" and len(slot.sub_items) < slot.capacity:
+                slot.sub_items.extend([EMPTY_GUID] * (slot.capacity - len(slot.sub_items)))
+            slots.setdefault(slot.name, slot.sub_items)
+        self._module_slots.setdefault(module.name, slots)
+
+    def _link_to_module_slot(self, item_guid, module_name, slot_names, canal):
+        """Grava o GUID no canal do primeiro slot encontrado dentre slot_names"""
+        slots = self._module_slots.get(module_name)
+        if slots is None:
             return False
-            
-        try:
-            modules = self.project_data['Areas'][0]['SubItems'][0]['AutomationBoards'][0]['ModulesList']
-            for module in modules:
-                if 'HsnetAddress' in module and module['HsnetAddress'] == hsnet_address:
-                    return True
-        except (KeyError, IndexError):
-            pass
-            
+        for slot_name in slot_names:
+            sub_items = slots.get(slot_name)
+            if sub_items is not None:
+                sub_items[canal-1] = item_guid
+                return True
         return False
 
-    def _add_shade(self, area, ambiente, name, description="Persiana"):
+    def reserve_hsnet_range(self, first, last=None):
+        """Reserva endereços HSNET que não devem ser atribuídos a novos módulos (chamar após create_project)"""
+        self._hsnet_allocator.reserve(first, last)
+
+    def _add_shade(self, area, ambiente, name, description="Persiana", key=None):
         """Adiciona uma persiana ao projeto"""
-        area_idx = next(i for i, a in enumerate(self.project_data["Areas"]) if a["Name"] == area)
-        room_idx = next(i for i, r in enumerate(self.project_data["Areas"][area_idx]["SubItems"]) if r["Name"] == ambiente)
+        room = self._get_room(area, ambiente)
 
-        next_unit_id = self._find_max_unit_id() + 1
+        next_unit_id = self._allocate_unit_ids(3)
 
-        new_shade = {
-            "$type": "Shade",
-            "ShadeType": 0,
-            "ShadeIcon": 0,
-            "ProfileGuid": "20000000-0000-0000-0000-000000000001",
-            "UnitMovement": {
-                "$type": "Unit",
-                "Id": next_unit_id,
-                "Event": 0,
-                "Scene": 0,
-                "Disabled": False,
-                "Logged": False,
-                "Memo": False,
-                "Increment": False
-            },
-            "UnitOpenedPercentage": {
-                "$type": "Unit",
-                "Id": next_unit_id + 1,
-                "Event": 0,
-                "Scene": 0,
-                "Disabled": False,
-                "Logged": False,
-                "Memo": False,
-                "Increment": False
-            },
-            "UnitCurrentPosition": {
-                "$type": "Unit",
-                "Id": next_unit_id + 2,
-                "Event": 0,
-                "Scene": 0,
-                "Disabled": False,
-                "Logged": False,
-                "Memo": False,
-                "Increment": False
-            },
-            "Name": name,
-            "Guid": str(uuid.uuid4()),
-            "Description": description
-        }
-        self.project_data["Areas"][area_idx]["SubItems"][room_idx]["LoadOutputs"].append(new_shade)
-        return new_shade["Guid"]
+        new_shade = Shade(
+            name,
+            self._new_guid("Shade", area, ambiente, key or name),
+            Unit(next_unit_id),
+            Unit(next_unit_id + 1),
+            Unit(next_unit_id + 2),
+            description,
+        )
+        room.load_outputs.append(new_shade)
+        self._stats['shades'] += 1
+        return new_shade.guid
 
-    def _add_hvac(self, area, ambiente, name, description="HVAC"):
+    def _add_hvac(self, area, ambiente, name, description="HVAC", key=None):
         """Adiciona um HVAC ao projeto"""
-        area_idx = next(i for i, a in enumerate(self.project_data["Areas"]) if a["Name"] == area)
-        room_idx = next(i for i, r in enumerate(self.project_data["Areas"][area_idx]["SubItems"]) if r["Name"] == ambiente)
+        room = self._get_room(area, ambiente)
 
-        new_hvac = {
-            "$type": "HVAC",
-            "ProfileGuid": "14000000-0000-0000-0000-000000000001",
-            "ControlModelGuid": "17000000-0000-0000-0000-000000000001",
-            "Unit": None,
-            "Name": name,
-            "Guid": str(uuid.uuid4()),
-            "Description": description
-        }
+        new_hvac = Hvac(name, self._new_guid("HVAC", area, ambiente, key or name), description)
 
-        self.project_data["Areas"][area_idx]["SubItems"][room_idx]["LoadOutputs"].append(new_hvac)
-        return new_hvac["Guid"]
+        room.load_outputs.append(new_hvac)
+        self._stats['hvac'] += 1
+        return new_hvac.guid
 
     def _link_shade_to_module(self, shade_guid, module_name, canal):
         """Vincula uma persiana a um módulo"""
         try:
-            modules_list = self.project_data['Areas'][0]['SubItems'][0]['AutomationBoards'][0]['ModulesList']
-            for module in modules_list:
-                if module['Name'] == module_name:
-                    for slot in module['Slots']:
-                        if slot['Name'] == 'Shade':
-                            while len(slot['SubItemsGuid']) < slot['SlotCapacity']:
-                                slot['SubItemsGuid'].append("00000000-0000-0000-0000-000000000000")
-                            slot['SubItemsGuid'][canal-1] = shade_guid
-                            return True
+            return self._link_to_module_slot(shade_guid, module_name, LINK_SLOTS['persiana'], canal)
         except Exception as e:
-            print("Erro ao linkar persiana:", e)
+            logger.warning("Erro ao linkar persiana: %s", e)
         return False
 
     def _link_hvac_to_module(self, hvac_guid, module_name, canal):
         """Vincula um HVAC a um módulo"""
         try:
-            modules_list = self.project_data['Areas'][0]['SubItems'][0]['AutomationBoards'][0]['ModulesList']
-            for module in modules_list:
-                if module['Name'] == module_name:
-                    for slot in module['Slots']:
-                        if slot['Name'] == 'IR':
-                            while len(slot['SubItemsGuid']) < slot['SlotCapacity']:
-                                slot['SubItemsGuid'].append("00000000-0000-0000-0000-000000000000")
-                            slot['SubItemsGuid'][canal-1] = hvac_guid
-                            return True
+            return self._link_to_module_slot(hvac_guid, module_name, LINK_SLOTS['hvac'], canal)
         except Exception as e:
-            print("Erro ao linkar HVAC:", e)
+            logger.warning("Erro ao linkar HVAC: %s", e)
         return False
 
-    def _add_load(self, area, ambiente, name, power=0.0, description="ON/OFF"):
+    def _add_load(self, area, ambiente, name, power=0.0, description="ON/OFF", key=None):
         """Adiciona um circuito de iluminação"""
-        area_idx = next(i for i, a in enumerate(self.project_data["Areas"]) if a["Name"] == area)
-        room_idx = next(i for i, r in enumerate(self.project_data["Areas"][area_idx]["SubItems"]) if r["Name"] == ambiente)
+        room = self._get_room(area, ambiente)
 
-        next_unit_id = self._find_max_unit_id() + 1
+        next_unit_id = self._allocate_unit_ids(1)
 
-        new_load = {
-            "$type": "Circuit",
-            "LoadType": 0,
-            "IconPath": 0,
-            "Power": power,
-            "ProfileGuid": "10000000-0000-0000-0000-000000000001",
-            "Unit": {
-                "$type": "Unit",
-                "Id": next_unit_id,
-                "Event": 0,
-                "Scene": 0,
-                "Disabled": False,
-                "Logged": False,
-                "Memo": False,
-                "Increment": False
-            },
-            "Name": name,
-            "Guid": str(uuid.uuid4()),
-            "Description": description
-        }
-        self.project_data["Areas"][area_idx]["SubItems"][room_idx]["LoadOutputs"].append(new_load)
-        return new_load["Guid"]
+        new_load = Load(
+            name,
+            self._new_guid("Circuit", area, ambiente, key or name),
+            Unit(next_unit_id),
+            power,
+            description,
+        )
+        room.load_outputs.append(new_load)
+        self._stats['loads'] += 1
+        return new_load.guid
+
+    def _allocate_unit_ids(self, count=1):
+        """Reserva um bloco contíguo de Unit IDs e retorna o primeiro"""
+        first_id = self._next_unit_id
+        self._next_unit_id += count
+        if self.debug and self.project_data:
+            self._check_unit_ids(first_id)
+        return first_id
+
+    def _check_unit_ids(self, first_id):
+        """Confere se nenhum Unit ID da árvore colide com o bloco recém-alocado"""
+        max_id = self._find_max_unit_id()
+        if max_id >= first_id:
+            raise RuntimeError(
+                f"Alocador de Unit ID inconsistente: bloco inicia em {first_id}, "
+                f"mas o projeto já usa o ID {max_id}"
+            )
 
     def _find_max_unit_id(self):
         """Encontra o maior Unit ID atual, considerando UnitComposers"""
         max_id = 0
-        
-        def find_ids(data):
-            nonlocal max_id
-            if isinstance(data, dict):
-                if data.get("$type") == "Unit" and "Id" in data:
-                    max_id = max(max_id, data["Id"])
-                # Também procurar em UnitComposers
-                if "UnitComposers" in data and isinstance(data["UnitComposers"], list):
-                    for composer in data["UnitComposers"]:
-                        if isinstance(composer, dict) and "Unit" in composer:
-                            unit = composer["Unit"]
-                            if isinstance(unit, dict) and "Id" in unit:
-                                max_id = max(max_id, unit["Id"])
-                for value in data.values():
-                    find_ids(value)
-            elif isinstance(data, list):
-                for item in data:
-                    find_ids(item)
-        
-        find_ids(self.project_data)
+        for area in self.project_data["Areas"]:
+            for room in area.rooms:
+                for item in room.load_outputs:
+                    for unit in item.units():
+                        if unit is not None:
+                            max_id = max(max_id, unit.id)
+                for board in room.automation_boards:
+                    for module in board["ModulesList"]:
+                        max_id = max(max_id, *module.unit_ids(), 0)
         return max_id
 
     def _link_load_to_module(self, load_guid, module_name, canal):
         """Vincula um circuito de iluminação a um módulo"""
         try:
-            modules_list = self.project_data['Areas'][0]['SubItems'][0]['AutomationBoards'][0]['ModulesList']
-            for module in modules_list:
-                if module['Name'] == module_name:
-                    # tentar ON/OFF e depois DIM
-                    for wanted in ('Load ON/OFF', 'Load Dim'):
-                        for slot in module.get('Slots', []):
-                            if slot.get('Name') == wanted:
-                                while len(slot['SubItemsGuid']) < slot.get('SlotCapacity', 0):
-                                    slot['SubItemsGuid'].append("00000000-0000-0000-0000-000000000000")
-                                slot['SubItemsGuid'][canal-1] = load_guid
-                                return True
-                    break
+            return self._link_to_module_slot(load_guid, module_name, LINK_SLOTS['luz'], canal)
         except Exception as e:
-            print("Erro ao linkar load:", e)
+            logger.warning("Erro ao linkar load: %s", e)
         return False
 
     # Implementar métodos similares para:
     # _add_shade, _add_hvac, _link_shade_to_module, _link_hvac_to_module
 
-    def export_project(self):
-        """Exporta o projeto como JSON (formato Roehn Wizard)"""
+    def export_project(self, output_mode='pretty'):
+        """Exporta o projeto como JSON (formato Roehn Wizard)
+
+        Nos modos 'pretty' e 'compact' retorna uma string; no modo 'gzip'
+        retorna os bytes do JSON compacto comprimido.
+        """
         if not self.project_data:
             raise ValueError("Nenhum projeto para exportar")
-            
-        return json.dumps(self.project_data, indent=2, ensure_ascii=False)
\ No newline at end of file
+
+        options = self._json_options(output_mode)
+        if output_mode == 'gzip':
+            return gzip.compress(json_backend.dumpb(self.project_data, **options), GZIP_LEVEL)
+        return json_backend.dumps(self.project_data, **options)
+
+    def export_project_stream(self, output_mode='pretty', chunk_size=EXPORT_CHUNK_SIZE):
+        """Exporta o projeto em blocos de bytes UTF-8, sem montar o JSON inteiro em memória"""
+        if not self.project_data:
+            raise ValueError("Nenhum projeto para exportar")
+
+        chunks = json_backend.iter_dumps(self.project_data, chunk_size=chunk_size, **self._json_options(output_mode))
+        if output_mode == 'gzip':
+            return self._iter_gzip_chunks(chunks)
+        return chunks
+
+    @staticmethod
+    def _json_options(output_mode):
+        """Argumentos de json_backend correspondentes ao modo de saída"""
+        if output_mode not in EXPORT_MODES:
+            raise ValueError(f"Modo de saída inválido: {output_mode}")
+        if output_mode == 'pretty':
+            return {'indent': 2, 'ensure_ascii': False, 'default': rwp_default}
+        return {'separators': (',', ':'), 'ensure_ascii': False, 'default': rwp_default}
+
+    @staticmethod
+    def _iter_gzip_chunks(chunks):
+        """Comprime os blocos no formato gzip à medida que são gerados"""
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
@@ -0,0 +1,54 @@
+import os
+import sys
+from unittest import mock
+
+import pytest
+from flask import Flask
+
+# Os módulos da aplicação ficam na pasta acima (não há pacote instalável)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db, User  # noqa: E402
+
+
+@pytest.fixture
+def db_app(tmp_path):
+    """App mínima com um banco SQLite em arquivo (o pysqlite se comporta como em produção)"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'projetos.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        user = User(username='teste', email='teste@example.com')
+        user.set_password('teste')
+        db.session.add(user)
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture(scope='session')
+def web_app(tmp_path_factory):
+    """A aplicação completa, com banco e cache em uma pasta temporária
+
+    app.py cria as tabelas e o usuário admin ao ser importado, então as
+    variáveis de ambiente precisam estar definidas antes do import.
+    """
+    tmp = tmp_path_factory.mktemp('app')
+    env = {
+        'DATABASE_URL': f"sqlite:///{tmp / 'projetos.db'}",
+        'ARTIFACT_CACHE_DIR': str(tmp / 'artifact_cache'),
+    }
+    with mock.patch.dict(os.environ, env):
+        from app import app
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(web_app):
+    """Cliente de teste já autenticado como admin"""
+    client = web_app.test_client()
+    response = client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 302
+    return client
@@ -0,0 +1,19 @@
+from artifact_cache import ArtifactCache
+
+
+def test_artefato_aberto_continua_legivel_apos_despejo(tmp_path):
+    cache = ArtifactCache(str(tmp_path), 1 << 20)
+    cache.put(1, 1, 'pdf', None, b'conteudo').close()
+
+    cached = cache.get(1, 1, 'pdf')
+    # Outro processo remove o artefato entre o acerto e o envio
+    cache.invalidate(1)
+    with cached as f:
+        assert f.read() == b'conteudo'
+    assert cache.get(1, 1, 'pdf') is None
+
+
+def test_cache_desativado(tmp_path):
+    cache = ArtifactCache(str(tmp_path / 'cache'), 0)
+    assert cache.put(1, 1, 'csv', None, b'x') is None
+    assert cache.get(1, 1, 'csv') is None
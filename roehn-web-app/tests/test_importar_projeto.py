@@ -0,0 +1,87 @@
+import io
+import json
+
+from database import Projeto, Circuito, Vinculacao
+
+
+def _criar_projeto(client, nome):
+    """Projeto com uma área, um ambiente, módulos e circuitos vinculados, criado pelas rotas"""
+    projeto_id = client.post('/projeto/novo', data={'nome': nome}).json['id']
+    area_id = client.post('/areas', data={'nome': 'Térreo'}).json['id']
+    ambiente_id = client.post('/ambientes', data={'nome': 'Sala', 'area_id': area_id}).json['id']
+    modulos = {
+        tipo: client.post('/modulos', data={'nome': f'{tipo}-1', 'tipo': tipo}).json['id']
+        for tipo in ('RL4', 'LX4', 'SA1')
+    }
+    canais = {}
+    for i, tipo in enumerate(['luz', 'persiana', 'hvac', 'luz']):
+        circuito = client.post('/circuitos', data={
+            'identificador': f'c{i}', 'nome': f'Circuito {i}', 'tipo': tipo, 'ambiente_id': ambiente_id,
+        }).json
+        assert circuito['success'], circuito
+        modulo = {'luz': 'RL4', 'persiana': 'LX4', 'hvac': 'SA1'}[tipo]
+        canais[modulo] = canais.get(modulo, 0) + 1
+        vinculo = client.post('/vinculacao', data={
+            'circuito_id': circuito['id'], 'modulo_id': modulos[modulo], 'canal': canais[modulo],
+        }).json
+        assert vinculo['success'], vinculo
+    return projeto_id
+
+
+def _importar(client, conteudo):
+    return client.post(
+        '/importar-projeto',
+        data={'file': (io.BytesIO(conteudo), 'projeto.json')},
+        content_type='multipart/form-data',
+    )
+
+
+def _resumo(projeto_id):
+    """Circuitos do projeto com SAKs e vinculações, sem os IDs do banco"""
+    return sorted(
+        (c.identificador, c.nome, c.tipo, c.ambiente.area.nome, c.ambiente.nome, c.sak, c.quantidade_saks,
+         c.vinculacao and (c.vinculacao.modulo.nome, c.vinculacao.modulo.tipo, c.vinculacao.canal))
+        for c in Circuito.query.filter_by(projeto_id=projeto_id)
+    )
+
+
+def test_importar_projeto_exportado(client, web_app):
+    projeto_id = _criar_projeto(client, 'Original')
+    exportado = json.loads(client.get(f'/exportar-projeto/{projeto_id}').data)
+    exportado['projeto']['nome'] = 'Importado'
+
+    response = _importar(client, json.dumps(exportado, indent=2).encode('utf-8'))
+    assert response.json['success'], response.json
+
+    with web_app.app_context():
+        novo_id = response.json['projeto_id']
+        assert novo_id != projeto_id
+        assert _resumo(novo_id) == _resumo(projeto_id)
+        assert Vinculacao.query.filter_by(projeto_id=novo_id).count() == 4
+
+
+def test_importar_json_truncado_ou_invalido(client, web_app):
+    projeto_id = _criar_projeto(client, 'Para truncar')
+    exportado = json.loads(client.get(f'/exportar-projeto/{projeto_id}').data)
+    exportado['projeto']['nome'] = 'Quebrado'
+    conteudo = json.dumps(exportado).encode('utf-8')
+
+    with web_app.app_context():
+        projetos = Projeto.query.count()
+    for invalido in (conteudo[:len(conteudo) // 2], conteudo[:-1], b'{"projeto": {"nome": "Quebrado"},', b'[]'):
+        response = _importar(client, invalido)
+        assert response.status_code == 200
+        assert response.json['success'] is False
+        assert response.json['message'].startswith('Erro na importação')
+    with web_app.app_context():
+        # Nada da importação parcial fica no banco
+        assert Projeto.query.count() == projetos
+        assert Projeto.query.filter_by(nome='Quebrado').first() is None
+
+
+def test_upload_acima_do_limite(client, web_app, monkeypatch):
+    monkeypatch.setitem(web_app.config, 'MAX_CONTENT_LENGTH', 1024)
+    response = _importar(client, b' ' * 4096)
+    assert response.status_code == 413
+    assert response.json['success'] is False
+    assert 'limite' in response.json['message']
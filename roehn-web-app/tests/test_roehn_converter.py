@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+from roehn_converter import RoehnProjectConverter, Load, Unit
+
+PROJECT_INFO = {'project_name': 'Teste', 'client_name': 'Cliente'}
+
+
+def _converter_com_unit_id_duplicado(debug):
+    """Conversor cujo próximo Unit ID já está em uso por um circuito da árvore"""
+    converter = RoehnProjectConverter(debug=debug)
+    converter.create_project(PROJECT_INFO)
+    room = converter._ensure_room_exists('Térreo', 'Sala')
+    room.load_outputs.append(Load('Duplicado', 'guid-duplicado', Unit(converter._next_unit_id)))
+    return converter
+
+
+def test_check_unit_ids_detecta_duplicado_em_modo_debug():
+    converter = _converter_com_unit_id_duplicado(debug=True)
+    with pytest.raises(RuntimeError, match="Alocador de Unit ID inconsistente"):
+        converter._add_load('Térreo', 'Sala', 'Luz')
+
+
+def test_check_unit_ids_ignorado_fora_do_modo_debug():
+    converter = _converter_com_unit_id_duplicado(debug=False)
+    converter._add_load('Térreo', 'Sala', 'Luz')
+    unit_ids = [load.unit.id for load in converter._get_room('Térreo', 'Sala').load_outputs]
+    assert unit_ids[0] == unit_ids[1]
+
+
+def test_unit_ids_alocados_sem_duplicados_em_modo_debug():
+    converter = RoehnProjectConverter(debug=True)
+    converter.create_project(PROJECT_INFO)
+    converter._ensure_room_exists('Térreo', 'Sala')
+    converter._ensure_module_exists('RL4', 'RL4-1')
+    converter._add_load('Térreo', 'Sala', 'Luz 1')
+    converter._add_load('Térreo', 'Sala', 'Luz 2')
+    unit_ids = [load.unit.id for load in converter._get_room('Térreo', 'Sala').load_outputs]
+    assert len(set(unit_ids)) == 2
+
+
+def test_csv_rejeitado_nao_cria_area_nem_ambiente():
+    csv_content = "\n".join([
+        "Circuito,Tipo,Nome,Area,Ambiente,SAKs,Canal,Modulo,id Modulo",
+        "c1,luz,Luz,Térreo,Sala,1,1,RL4,1",
+        "c2,luz,Luz,Fantasma,Sala,2,1,XYZ,1",
+        "c3,luz,Luz,Térreo,Cozinha,3,9,RL4,1",
+        "c4,hvac,Ar,Térreo,Quarto,4,1,RL4,1",
+    ])
+    converter = RoehnProjectConverter()
+    converter.create_project(PROJECT_INFO)
+    report = converter.process_csv_stream(io.StringIO(csv_content))
+
+    assert [rejeicao['linha'] for rejeicao in report['rejeitadas']] == [3, 4, 5]
+    assert 'Fantasma' not in converter._areas_by_name
+    rooms = [room.name for room in converter._areas_by_name['Térreo'].rooms]
+    assert rooms == ['Sala']
@@ -0,0 +1,55 @@
+import glob
+import json
+import os
+
+from database import db, Circuito
+from test_importar_projeto import _criar_projeto
+
+
+def _gerar_rwp(client):
+    with client.post('/roehn/import', data={'output_mode': 'compact'}) as response:
+        assert response.status_code == 200, response.data[:200]
+        return json.loads(response.data)
+
+
+def _circuitos(rwp):
+    return {
+        item['Name']: item['Guid']
+        for area in rwp['Areas'] for room in area['SubItems'] for item in room['LoadOutputs']
+    }
+
+
+def _renomear_circuito(web_app, projeto_id):
+    """Renomeia o primeiro circuito do projeto (o que também incrementa a revisão); retorna o nome antigo"""
+    with web_app.app_context():
+        circuito = Circuito.query.filter_by(projeto_id=projeto_id).order_by(Circuito.id).first()
+        nome = circuito.nome
+        circuito.nome = 'Renomeado'
+        db.session.commit()
+    return nome
+
+
+def test_geracao_incremental_mantem_guids(client, web_app):
+    projeto_id = _criar_projeto(client, 'Incremental')
+    antes = _circuitos(_gerar_rwp(client))
+
+    nome = _renomear_circuito(web_app, projeto_id)
+    depois = _circuitos(_gerar_rwp(client))
+
+    assert depois.pop('Renomeado') == antes.pop(nome)
+    assert depois == antes
+
+
+def test_estado_invalido_gera_do_zero(client, web_app):
+    from app import artifact_cache
+
+    projeto_id = _criar_projeto(client, 'Estado invalido')
+    _gerar_rwp(client)
+    estados = glob.glob(os.path.join(artifact_cache.directory, f'{projeto_id}-estado-rwp-state-*.bin'))
+    assert estados
+    for path in estados:
+        with open(path, 'wb') as f:
+            f.write(b'{"project": {}, "index": {}}')
+
+    _renomear_circuito(web_app, projeto_id)
+    assert 'Renomeado' in _circuitos(_gerar_rwp(client))
@@ -0,0 +1,67 @@
+from database import db, User, Projeto, Area, Ambiente, Circuito, SakAlocador, SakLivre, reservar_saks, liberar_saks
+
+
+def _projeto_com_saks(*saks, tipo='luz', quantidade_saks=1):
+    """Projeto sem alocador (como os anteriores a ele) com circuitos nos SAKs informados"""
+    projeto = Projeto(nome='Projeto', user_id=User.query.first().id)
+    ambiente = Ambiente(nome='Sala', area=Area(nome='Térreo', projeto=projeto))
+    db.session.add(ambiente)
+    db.session.commit()
+    for i, sak in enumerate(saks):
+        db.session.add(Circuito(identificador=f'c{i}', nome=f'C{i}', tipo=tipo, ambiente_id=ambiente.id,
+                                sak=sak, quantidade_saks=quantidade_saks))
+    db.session.commit()
+    return projeto.id
+
+
+def _excluir(projeto_id, identificador):
+    """Exclui um circuito como a rota de exclusão faz, devolvendo seus SAKs"""
+    circuito = Circuito.query.filter_by(projeto_id=projeto_id, identificador=identificador).one()
+    liberar_saks(projeto_id, circuito.sak, circuito.quantidade_saks, circuito.tipo)
+    db.session.delete(circuito)
+    db.session.commit()
+
+
+def test_primeira_reserva_usa_buraco_entre_saks_existentes(db_app):
+    projeto_id = _projeto_com_saks(1, 4)
+    assert reservar_saks(projeto_id, 2) == 2
+    assert reservar_saks(projeto_id, 1) == 5
+    db.session.commit()
+    assert SakLivre.query.filter_by(projeto_id=projeto_id).count() == 0
+
+
+def test_reserva_desfeita_com_a_transacao(db_app):
+    projeto_id = _projeto_com_saks(1, 4)
+    reservar_saks(projeto_id, 1)
+    db.session.rollback()
+    assert db.session.get(SakAlocador, projeto_id) is None
+    assert SakLivre.query.filter_by(projeto_id=projeto_id).count() == 0
+    # Sem resto da tentativa anterior, a reserva começa de novo pelo buraco
+    assert reservar_saks(projeto_id, 1) == 2
+
+
+def test_liberar_persiana_antiga_devolve_dois_saks(db_app):
+    # Persianas importadas de JSON antigos gravaram quantidade_saks=1, mas ocupam 2 SAKs
+    projeto_id = _projeto_com_saks(1, 3, 5, tipo='persiana')
+    reservar_saks(projeto_id, 1)
+    _excluir(projeto_id, 'c1')
+    assert reservar_saks(projeto_id, 2) == 3
+
+
+def test_liberar_circuito_sem_quantidade_saks(db_app):
+    projeto_id = _projeto_com_saks(1, 2, 3, quantidade_saks=None)
+    reservar_saks(projeto_id, 1)
+    _excluir(projeto_id, 'c1')
+    assert reservar_saks(projeto_id, 1) == 2
+
+
+def test_liberar_nao_devolve_saks_de_outro_circuito(db_app):
+    # Dados antigos com uma persiana de 1 SAK encostada no circuito seguinte
+    projeto_id = _projeto_com_saks(1, 3, quantidade_saks=1, tipo='persiana')
+    db.session.add(Circuito(identificador='luz', nome='Luz', tipo='luz', sak=2, quantidade_saks=1,
+                            ambiente_id=Ambiente.query.first().id))
+    db.session.commit()
+    reservar_saks(projeto_id, 1)
+    _excluir(projeto_id, 'c0')
+    assert reservar_saks(projeto_id, 1) == 1
+    assert reservar_saks(projeto_id, 1) == 6
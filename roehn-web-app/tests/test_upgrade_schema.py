@@ -0,0 +1,33 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from database import db, User, Projeto, upgrade_schema
+
+
+@pytest.fixture
+def fuso_fora_de_utc(monkeypatch):
+    """Fuso local diferente de UTC, para que datetime.now() e CURRENT_TIMESTAMP difiram"""
+    if not hasattr(time, 'tzset'):
+        pytest.skip("time.tzset indisponível nesta plataforma")
+    monkeypatch.setenv('TZ', 'America/Bahia')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_atualizado_em_preenchido_com_o_relogio_da_aplicacao(db_app, fuso_fora_de_utc):
+    db.session.add(Projeto(nome='Antigo', user_id=User.query.first().id))
+    db.session.commit()
+    # Banco anterior à coluna
+    with db.engine.begin() as conn:
+        conn.execute(text("ALTER TABLE projeto DROP COLUMN atualizado_em"))
+    db.session.remove()
+
+    upgrade_schema()
+
+    atualizado_em = Projeto.query.one().atualizado_em
+    assert abs(atualizado_em - datetime.now()) < timedelta(minutes=1)